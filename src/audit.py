@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+audit.py — resumable bulk library audit
+
+Evaluates the ISO/extension policy against torrents already in qBittorrent without
+the stop/start churn of TorrentGuard.run:
+- Lists torrents page by page (/api/v2/torrents/info, sorted by added_on) for each
+  category in QBIT_ALLOWED_CATEGORIES.
+- Fetches file lists in parallel with bounded concurrency (AUDIT_CONCURRENCY).
+- Torrents that pass are left untouched (never stopped). Violations are tagged,
+  blocklisted in Sonarr/Radarr and deleted exactly like the guard would
+  (QBIT_DRY_RUN=1 only reports).
+- Progress is checkpointed after every page (AUDIT_CHECKPOINT_FILE) so an
+  interrupted audit resumes where it left off. Throughput stats are logged per page.
+- Torrents whose file list couldn't be fetched are recorded in the checkpoint and
+  retried after the category pass (and on the next run) until they're audited.
+
+Usage: audit.py [--restart]
+"""
+
+import os, sys, json, time, signal, logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from guard import Config, HttpClient, QbitClient, SonarrClient, RadarrClient, IsoCleaner, ArrRouter
+from version import VERSION
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(
+    level=getattr(logging, LOG_LEVEL, logging.INFO),
+    format="%(asctime)s | %(levelname)s | %(message)s",
+    stream=sys.stdout,
+)
+log = logging.getLogger("qbit-guard-audit")
+
+PAGE_SIZE = max(1, int(os.getenv("AUDIT_PAGE_SIZE", "200")))
+CONCURRENCY = max(1, int(os.getenv("AUDIT_CONCURRENCY", "8")))
+CHECKPOINT_FILE = os.getenv("AUDIT_CHECKPOINT_FILE", "/config/audit-checkpoint.json")
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f) or {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        log.warning("Audit: unreadable checkpoint %s (%s); starting over.", path, e)
+        return {}
+
+
+def save_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    """Atomic write (tmp + rename) so a crash never leaves a torn checkpoint."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+class Audit:
+    """Pages through one category at a time, evaluating policy on parallel-fetched file lists."""
+    def __init__(self, cfg: Config, state: Dict[str, Any]):
+        self.cfg = cfg
+        self.http = HttpClient.from_config(cfg)
+        self.qbit = QbitClient(cfg, HttpClient.from_config(cfg, breakers=False))
+        router = ArrRouter.from_config(cfg, self.http)
+        self.iso = IsoCleaner(cfg, self.qbit, router.first("sonarr") or SonarrClient(cfg, self.http),
+                              router.first("radarr") or RadarrClient(cfg, self.http), router)
+        self.state = state
+        self.state.setdefault("offsets", {})
+        self.state.setdefault("failed", {})  # hash -> {"category", "name"} whose files fetch failed
+        self.state.setdefault("stats", {"torrents": 0, "files": 0, "deleted_ext": 0, "deleted_iso": 0,
+                                         "no_metadata": 0, "errors": 0, "elapsed_sec": 0.0})
+        self.stop = False
+
+    def _files(self, t: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]], str]:
+        try:
+            return t, self.qbit.files(t["hash"]) or [], ""
+        except Exception as e:
+            return t, [], str(e)
+
+    def _log_progress(self, category: str, session_start: float, session_torrents: int, session_files: int) -> None:
+        st = self.state["stats"]
+        dt = max(time.monotonic() - session_start, 1e-6)
+        log.info("Audit [%s] offset=%d | total torrents=%d files=%d | deleted ext=%d iso=%d | no-metadata=%d errors=%d | "
+                 "this run: %.1f torrents/s, %.1f files/s",
+                 category, self.state["offsets"].get(category, 0), st["torrents"], st["files"],
+                 st["deleted_ext"], st["deleted_iso"], st["no_metadata"], st["errors"],
+                 session_torrents / dt, session_files / dt)
+
+    def _audit(self, t: Dict[str, Any], category: str, files: List[Dict[str, Any]]) -> bool:
+        """Evaluate and act on one torrent; True when it was deleted from qB."""
+        st = self.state["stats"]
+        if not files:
+            st["no_metadata"] += 1
+            return False
+        st["files"] += len(files)
+        verdict = self.iso.evaluate(files)
+        if verdict.deselect:
+            self.iso.act(t["hash"], category, verdict)  # selective mode: skip disallowed files
+        if not verdict.delete:
+            return False
+        log.info("Audit: %s violates policy (%s) | name='%s'", t["hash"], verdict.reason, t.get("name") or "")
+        if self.iso.act(t["hash"], category, verdict):
+            st["deleted_" + verdict.reason] += 1
+            return not self.cfg.dry_run
+        return False
+
+    def _retry_failed(self, pool: ThreadPoolExecutor) -> None:
+        failed = self.state["failed"]
+        if not failed:
+            return
+        log.info("Audit: retrying %d torrent(s) whose file list fetch failed earlier.", len(failed))
+        rows = [dict(v, hash=h) for h, v in failed.items()]
+        for t, files, err in pool.map(self._files, rows):
+            if err:
+                log.warning("Audit: files fetch failed again for %s: %s", t["hash"], err)
+                continue
+            del failed[t["hash"]]
+            self.state["stats"]["torrents"] += 1
+            self._audit(t, t["category"].lower(), files)
+        save_checkpoint(CHECKPOINT_FILE, self.state)
+
+    def run(self) -> bool:
+        """Returns True when every category has been fully audited."""
+        self.qbit.login()
+        st = self.state["stats"]
+        session_start = time.monotonic()
+        session_torrents = session_files = 0
+        categories = self.qbit.categories_matching(self.cfg.allowed_categories)
+        with ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="audit") as pool:
+            for category in categories:
+                if self.state["offsets"].get(category) == "done":
+                    continue
+                while not self.stop:
+                    offset = int(self.state["offsets"].get(category, 0))
+                    page_start = time.monotonic()
+                    page = self.qbit.torrents({"category": category, "sort": "added_on",
+                                               "limit": PAGE_SIZE, "offset": offset})
+                    if not page:
+                        self.state["offsets"][category] = "done"
+                        break
+
+                    deleted = 0
+                    for t, files, err in pool.map(self._files, page):
+                        if err:
+                            st["errors"] += 1
+                            log.warning("Audit: files fetch failed for %s (will retry): %s", t.get("hash"), err)
+                            self.state["failed"][t["hash"]] = {"category": category, "name": t.get("name") or ""}
+                            continue
+                        st["torrents"] += 1
+                        session_torrents += 1
+                        session_files += len(files)
+                        if self._audit(t, category.lower(), files):
+                            deleted += 1
+
+                    # Deleted torrents shift the remaining ones down by as many positions
+                    self.state["offsets"][category] = offset + len(page) - deleted
+                    st["elapsed_sec"] += time.monotonic() - page_start
+                    save_checkpoint(CHECKPOINT_FILE, self.state)
+                    self._log_progress(category, session_start, session_torrents, session_files)
+                    if len(page) < PAGE_SIZE:
+                        self.state["offsets"][category] = "done"
+                        break
+                save_checkpoint(CHECKPOINT_FILE, self.state)
+                if self.stop:
+                    return False
+            self._retry_failed(pool)
+        return all(self.state["offsets"].get(c) == "done" for c in categories) and not self.state["failed"]
+
+
+def main(argv: List[str]) -> None:
+    log.info("qbit-guard audit starting - version: %s", VERSION)
+    state = {} if "--restart" in argv else load_checkpoint(CHECKPOINT_FILE)
+    if state.get("complete"):
+        log.info("Audit: checkpoint %s records a completed audit; pass --restart to run again.", CHECKPOINT_FILE)
+        return
+    if state:
+        log.info("Audit: resuming from checkpoint %s (offsets=%s).", CHECKPOINT_FILE, state.get("offsets"))
+
+    audit = Audit(Config(), state)
+
+    def _sig(*_):
+        log.info("Audit: stop requested; finishing current page and saving checkpoint.")
+        audit.stop = True
+    for s in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(s, _sig)
+
+    try:
+        complete = audit.run()
+    except Exception as e:
+        save_checkpoint(CHECKPOINT_FILE, audit.state)
+        log.error("Audit aborted (checkpoint saved): %s", e)
+        sys.exit(1)
+
+    st = audit.state["stats"]
+    audit.state["complete"] = complete
+    save_checkpoint(CHECKPOINT_FILE, audit.state)
+    rate = st["torrents"] / st["elapsed_sec"] if st["elapsed_sec"] else 0.0
+    log.info("Audit %s | torrents=%d files=%d deleted ext=%d iso=%d no-metadata=%d errors=%d | %.1fs (%.1f torrents/s)",
+             "complete" if complete else "paused", st["torrents"], st["files"], st["deleted_ext"], st["deleted_iso"],
+             st["no_metadata"], st["errors"], st["elapsed_sec"], rate)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+bench_discovery.py — synthetic per-poll cost of the watcher's discovery modes
+
+Serves a stub qBittorrent (separate process, so its CPU isn't counted) holding N torrents,
+A of which are active: every maindata delta carries their progress/speed churn, the way a real
+qB reports it. Both WATCH_DISCOVERY_MODE implementations then poll it the same number of times
+while new torrents trickle in, and the response bytes and client CPU per poll are compared.
+Info mode's periodic reconcile listing is amortized at WATCH_RECONCILE_SECONDS / --poll-sec.
+
+Usage:
+  bench_discovery.py [--torrents N] [--active N] [--polls N] [--add-every N] [--poll-sec S]
+"""
+
+import os, sys, json, time, random, argparse, multiprocessing, urllib.parse as uparse, urllib.request as ureq
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+import watcher
+from guard import Config, HttpClient
+
+CHURN_FIELDS = ("dlspeed", "upspeed", "progress", "eta", "num_seeds", "num_leechs", "downloaded", "uploaded",
+                "downloaded_session", "uploaded_session", "amount_left", "completed", "time_active", "last_activity")
+
+
+def _row(i: int, added_on: int) -> Dict[str, Any]:
+    """A /torrents/info row with qB's full field set (values are synthetic)."""
+    h = f"{i:040x}"
+    return {
+        "hash": h, "infohash_v1": h, "infohash_v2": "", "name": f"Some.Show.S01E{i % 100:02d}.1080p.WEB-DL.x264-GRP{i % 50}",
+        "magnet_uri": f"magnet:?xt=urn:btih:{h}&dn=Some.Show&tr=udp%3A%2F%2Ftracker.example.org%3A1337",
+        "size": 1_500_000_000 + i, "total_size": 1_500_000_000 + i, "progress": 0.5, "dlspeed": 0, "upspeed": 0,
+        "priority": 0, "num_seeds": 0, "num_complete": 10, "num_leechs": 0, "num_incomplete": 3, "ratio": 0.0,
+        "eta": 8640000, "state": "stalledDL", "seq_dl": False, "f_l_piece_prio": False, "category": "tv-sonarr",
+        "tags": "", "super_seeding": False, "force_start": False, "save_path": "/downloads/tv", "download_path": "",
+        "content_path": f"/downloads/tv/Some.Show.S01E{i % 100:02d}", "added_on": added_on, "completion_on": 0,
+        "tracker": "udp://tracker.example.org:1337", "trackers_count": 3, "dl_limit": -1, "up_limit": -1,
+        "downloaded": 0, "uploaded": 0, "downloaded_session": 0, "uploaded_session": 0, "amount_left": 750_000_000,
+        "completed": 750_000_000, "max_ratio": -1, "max_seeding_time": -1, "ratio_limit": -2, "seeding_time_limit": -2,
+        "seen_complete": 0, "last_activity": added_on, "time_active": 0, "seeding_time": 0, "auto_tmm": True,
+        "availability": 1.0, "reannounce": 0, "comment": "", "popularity": 0.0, "private": False,
+    }
+
+
+class StubQbit:
+    def __init__(self, torrents: int, active: int):
+        self.rows: List[Dict[str, Any]] = [_row(i, 1_700_000_000 + i) for i in range(torrents)]
+        self.added_rid: Dict[str, int] = {}
+        self.active = active
+        self.rid = 0
+        self.rng = random.Random(7)
+
+    def add(self) -> None:
+        self.rid += 1
+        r = _row(len(self.rows), 1_700_000_000 + len(self.rows))
+        self.rows.append(r)
+        self.added_rid[r["hash"]] = self.rid
+
+    def maindata(self, rid: int) -> Dict[str, Any]:
+        self.rid += 1
+        state = {"dl_info_speed": self.rng.randint(0, 10**7), "up_info_speed": self.rng.randint(0, 10**6),
+                 "dl_info_data": self.rng.randint(0, 10**12), "up_info_data": self.rng.randint(0, 10**12)}
+        if not rid:
+            return {"rid": self.rid, "full_update": True, "torrents": {r["hash"]: r for r in self.rows},
+                    "categories": {"tv-sonarr": {"name": "tv-sonarr", "savePath": ""}}, "tags": [], "server_state": state}
+        delta: Dict[str, Dict[str, Any]] = {}
+        for r in self.rows[:self.active]:
+            delta[r["hash"]] = {k: self.rng.randint(0, 10**9) if k != "progress" else self.rng.random() for k in CHURN_FIELDS}
+        for h, at in self.added_rid.items():
+            if at > rid:
+                delta[h] = next(r for r in reversed(self.rows) if r["hash"] == h)
+        return {"rid": self.rid, "torrents": delta, "server_state": state}
+
+    def info(self, q: Dict[str, str]) -> List[Dict[str, Any]]:
+        if "tag" in q or "category" in q:
+            return []  # rescan keyword lookups: nobody is rescanning
+        rows = sorted(self.rows, key=lambda r: r["added_on"], reverse=q.get("reverse") == "true") if "sort" in q else self.rows
+        off = int(q.get("offset", 0))
+        return rows[off:off + int(q["limit"])] if "limit" in q else rows[off:]
+
+
+def _serve(port_q: "multiprocessing.Queue", torrents: int, active: int) -> None:
+    stub = StubQbit(torrents, active)
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *_): pass
+
+        def do_GET(self):
+            u = uparse.urlparse(self.path)
+            q = dict(uparse.parse_qsl(u.query))
+            if u.path == "/bench/add":
+                stub.add(); body = b"{}"
+            elif u.path == "/api/v2/sync/maindata":
+                body = json.dumps(stub.maindata(int(q.get("rid", 0)))).encode()
+            elif u.path == "/api/v2/torrents/info":
+                body = json.dumps(stub.info(q)).encode()
+            else:
+                self.send_error(404); return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    port_q.put(srv.server_address[1])
+    srv.serve_forever()
+
+
+def bench(mode: str, args: argparse.Namespace) -> Dict[str, float]:
+    port_q: "multiprocessing.Queue" = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(port_q, args.torrents, args.active), daemon=True)
+    server.start()
+    host = f"http://127.0.0.1:{port_q.get(timeout=10)}"
+    try:
+        cfg = Config(qbit_host=host)
+        d = watcher.DISCOVERY_MODES[mode](HttpClient.from_config(cfg, breakers=False), cfg)
+        d.poll()  # initial snapshot (same cost for both modes at startup); not counted
+        reconcile_every = max(1, int(watcher.RECONCILE_SEC / args.poll_sec)) if watcher.RECONCILE_SEC > 0 else 0
+        total_bytes, total_cpu, found = 0, 0.0, 0
+        for i in range(1, args.polls + 1):
+            if args.add_every and i % args.add_every == 0:
+                ureq.urlopen(f"{host}/bench/add").read()
+            if mode == "info" and reconcile_every and i % reconcile_every == 0:
+                d.last_reconcile = float("-inf")
+            cpu = time.process_time()
+            torrents, _ = d.poll()
+            total_cpu += time.process_time() - cpu
+            total_bytes += d.last_bytes
+            found += sum(1 for t in torrents.values() if "name" in t)
+        return {"bytes": total_bytes / args.polls, "cpu_ms": total_cpu * 1000.0 / args.polls, "found": found}
+    finally:
+        server.terminate()
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(prog="bench_discovery.py", description="Per-poll cost of maindata vs info discovery.")
+    ap.add_argument("--torrents", type=int, default=5000)
+    ap.add_argument("--active", type=int, default=500, help="torrents whose stats change every poll")
+    ap.add_argument("--polls", type=int, default=200)
+    ap.add_argument("--add-every", type=int, default=10, help="add one torrent every N polls (0 = never)")
+    ap.add_argument("--poll-sec", type=float, default=watcher.POLL_SEC, help="poll interval the reconcile is amortized over")
+    args = ap.parse_args(argv[1:])
+
+    print(f"{args.torrents} torrents, {args.active} active, {args.polls} polls, one add every {args.add_every} poll(s), "
+          f"reconcile every {watcher.RECONCILE_SEC:.0f}s at {args.poll_sec:.1f}s polls")
+    print(f"{'mode':<10} {'bytes/poll':>12} {'cpu ms/poll':>12} {'adds found':>11}")
+    for mode in ("maindata", "info"):
+        r = bench(mode, args)
+        print(f"{mode:<10} {r['bytes']:>12,.0f} {r['cpu_ms']:>12.2f} {r['found']:>11}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
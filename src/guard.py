@@ -5,7 +5,8 @@ guard.py
 Guard for qBittorrent 5.x:
 
 Flow (on torrent ADDED):
-  1) Stop torrent immediately (no payload).
+  1) Stop torrent immediately (no payload). Optional name prefilter: reject (delete) or
+     fast-track (skip the ISO/ext check) from the torrent name alone.
   2) PRE-AIR gate (Sonarr + optional TVmaze/TheTVDB cross-check).
      - If pre-air BLOCK: blocklist in Sonarr (dedup + retry + queue failover), delete from qB.
   3) If pre-air ALLOW (or not applicable): fetch metadata/file list (start -> wait -> stop),
@@ -13,17 +14,29 @@ Flow (on torrent ADDED):
        - If policy/ISO says delete (no keepable video, all files disallowed, pure disc images, etc.):
            blocklist in Sonarr/Radarr as applicable, delete.
        - Else: start torrent for real.
+     Optional GUARD_DECISION_DEADLINE_SEC bounds steps 2-3 end to end (GUARD_DEADLINE_ACTION on expiry).
+     File lists and verdicts are cached per infohash (GUARD_FILE_CACHE_DB), so re-added
+     torrents skip the metadata wait.
 
 Configurable via environment variables and optional /config/extensions.json.
 All logs go to stdout (container logs). Pure stdlib.
+
+Modes:
+  guard.py <INFO_HASH> [<CATEGORY>]   qB "run on torrent added" hook. Hands the hash to a running
+                                     daemon over GUARD_SOCKET if there is one, else runs in-process.
+  guard.py --daemon                   Long-lived daemon owning warm clients/caches; listens on GUARD_SOCKET.
 """
 
 from __future__ import annotations
-import os, sys, re, json, ssl, time, datetime, logging
+import os, sys, re, json, ssl, time, queue, signal, socket, sqlite3, hashlib, datetime, logging, threading, socketserver
+import contextlib
+import email.utils
 import http.cookiejar as cookiejar
+import urllib.error as uerr
 import urllib.parse as uparse
 import urllib.request as ureq
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields
 from typing import Any, Dict, List, Optional, Sequence, Tuple, Set
 from version import VERSION
 # --------------------------- Logging ---------------------------
@@ -37,6 +50,84 @@ logging.basicConfig(
 log = logging.getLogger("qbit-guard")
 log.info(f"qbit-guard starting - version: {VERSION}")
 
+# --------------------------- Metrics ---------------------------
+
+class Metrics:
+    """Thread-safe in-process counters/gauges; periodically dumped to the logs by long-running modes."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, Any] = {}
+
+    def inc(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def set(self, name: str, value: Any) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def max(self, name: str, value: float) -> None:
+        """Gauge holding the largest value seen."""
+        with self._lock:
+            if value > self._gauges.get(name, float("-inf")):
+                self._gauges[name] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+            out.update(self._gauges)
+            return out
+
+    def format(self) -> str:
+        snap = self.snapshot()
+        return " ".join(f"{k}={v}" for k, v in sorted(snap.items()))
+
+metrics = Metrics()
+
+# --------------------------- Decision deadline ---------------------------
+
+class DeadlineExceeded(Exception):
+    """The per-torrent decision deadline (GUARD_DECISION_DEADLINE_SEC) ran out."""
+
+
+_deadline = threading.local()  # per worker thread: monotonic time the current run must decide by
+
+
+@contextlib.contextmanager
+def deadline(seconds: Optional[float]):
+    """Bound everything in the block (HTTP timeouts, retry/poll sleeps) by `seconds`; None lifts the bound."""
+    prev = getattr(_deadline, "at", None)
+    _deadline.at = None if seconds is None else time.monotonic() + seconds
+    try:
+        yield
+    finally:
+        _deadline.at = prev
+
+
+def deadline_remaining() -> Optional[float]:
+    at = getattr(_deadline, "at", None)
+    return None if at is None else at - time.monotonic()
+
+
+def deadline_timeout(timeout: float, stage: str = "") -> float:
+    """`timeout` capped to the time left; raises DeadlineExceeded when none is left."""
+    left = deadline_remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded(f"decision deadline exceeded{' during ' + stage if stage else ''}")
+    return min(timeout, left)
+
+
+def deadline_sleep(seconds: float) -> None:
+    time.sleep(deadline_timeout(seconds))
+
+
+def deadline_check(stage: str) -> None:
+    """Stage boundary: raise if the stage finished (or was cut short) past the deadline."""
+    deadline_timeout(0.0, stage)
+
 # --------------------------- Helpers (extensions) ---------------------------
 
 def _split_exts(s: str) -> Set[str]:
@@ -53,6 +144,24 @@ def _ext_of(path: str) -> str:
     return base.rsplit(".", 1)[-1].lower()
 
 
+def _coerce_like(current: Any, raw: Any, name: str = "") -> Any:
+    """Coerce a JSON/string value to the type of an existing Config value."""
+    if isinstance(current, bool):
+        return raw if isinstance(raw, bool) else str(raw).strip().lower() in ("1", "true", "yes")
+    if isinstance(current, int):
+        return int(raw)
+    if isinstance(current, float):
+        return float(raw)
+    if isinstance(current, (set, frozenset)):
+        items = ",".join(map(str, raw)) if isinstance(raw, (list, tuple)) else str(raw or "")
+        if name.endswith("_exts"):
+            return _split_exts(items)
+        return frozenset(x.strip().lower() for x in items.split(",") if x.strip())
+    if isinstance(current, str):
+        return str(raw).strip()
+    return raw
+
+
 # --------------------------- Config ---------------------------
 
 # Canonical sets
@@ -107,6 +216,11 @@ class Config:
     resume_if_no_history: bool = os.getenv("RESUME_IF_NO_HISTORY", "1") == "1"
     sonarr_timeout_sec: int = int(os.getenv("SONARR_TIMEOUT_SEC", "45"))
     sonarr_retries: int = int(os.getenv("SONARR_RETRIES", "3"))
+    preair_cache_max_entries: int = int(os.getenv("PREAIR_CACHE_MAX_ENTRIES", "10000"))  # 0 = no cache
+    preair_cache_unknown_ttl_sec: int = int(os.getenv("PREAIR_CACHE_UNKNOWN_TTL_SEC", "300"))
+    # Background Sonarr /calendar prefetch (long-running modes); the gate answers from it before live lookups
+    preair_calendar_refresh_sec: float = float(os.getenv("PREAIR_CALENDAR_REFRESH_SEC", "900"))  # 0 = off
+    preair_calendar_past_hours: float = float(os.getenv("PREAIR_CALENDAR_PAST_HOURS", "24"))
 
     # Internet cross-checks
     internet_check_provider: str = os.getenv("INTERNET_CHECK_PROVIDER", "tvmaze").strip().lower()  # off|tvmaze|tvdb|both
@@ -126,6 +240,18 @@ class Config:
     metadata_poll_interval: float = float(os.getenv("METADATA_POLL_INTERVAL", "1.5"))
     metadata_max_wait_sec: int = int(os.getenv("METADATA_MAX_WAIT_SEC", "0"))  # 0 = wait indefinitely
     metadata_download_budget_bytes: int = int(os.getenv("METADATA_DOWNLOAD_BUDGET_BYTES", "0"))  # 0 = no cap
+    # Set every file to priority 0 the moment the file list appears; restored when the torrent is allowed
+    metadata_zero_payload: bool = os.getenv("METADATA_ZERO_PAYLOAD", "1") in ("1","true","yes")
+    # Held priorities are also written here (one <hash>.json each) so a restart between hold and restore can't strand them
+    metadata_held_dir: str = os.getenv("METADATA_HELD_DIR", "/config/guard-held")
+    # Persistent infohash -> file list + verdict cache; re-added torrents skip the metadata wait ("" = off)
+    file_cache_db: str = os.getenv("GUARD_FILE_CACHE_DB", "/config/guard-files.sqlite")
+    file_cache_max: int = int(os.getenv("GUARD_FILE_CACHE_MAX", "50000"))
+
+    # One budget for the whole decision of a run (pre-air, metadata wait, policy); 0 = unbounded.
+    # On expiry: allow (start), stop (keep stopped, tagged guard:deadline) or delete.
+    decision_deadline_sec: float = float(os.getenv("GUARD_DECISION_DEADLINE_SEC", "0"))
+    deadline_action: str = os.getenv("GUARD_DEADLINE_ACTION", "stop").strip().lower()  # allow|stop|delete
 
     # Radarr (ISO deletes)
     radarr_url: str = (os.getenv("RADARR_URL", "http://127.0.0.1:7878") or "").rstrip("/")
@@ -136,6 +262,29 @@ class Config:
     radarr_timeout_sec: int = int(os.getenv("RADARR_TIMEOUT_SEC", "45"))
     radarr_retries: int = int(os.getenv("RADARR_RETRIES", "3"))
 
+    # Several Sonarr/Radarr instances routed by category: JSON list (or path to a JSON file) of
+    # {"name","kind":"sonarr|radarr","url","apikey","categories":[...],"timeout","retries"}.
+    # Empty = the single SONARR_*/RADARR_* instance above.
+    arr_instances: str = os.getenv("ARR_INSTANCES", "")
+
+    # Learned rejection terms: release-name tokens behind ISO/ext deletions that reach the threshold (and never
+    # appear in allowed releases) are synced into a managed "must not contain" release profile in Sonarr/Radarr
+    learn_terms: bool = os.getenv("GUARD_LEARN_TERMS", "0") in ("1","true","yes")
+    learn_threshold: int = int(os.getenv("GUARD_LEARN_THRESHOLD", "3"))
+    learn_max_terms: int = int(os.getenv("GUARD_LEARN_MAX_TERMS", "100"))
+    learn_sync_interval_sec: float = float(os.getenv("GUARD_LEARN_SYNC_SEC", "600"))
+    learn_state_file: str = os.getenv("GUARD_LEARN_STATE_FILE", "/config/learned-terms.json")
+    learn_profile_name: str = os.getenv("GUARD_LEARN_PROFILE_NAME", "qbit-guard learned terms")
+
+    # HTTP circuit breakers (per upstream host; threshold 0 disables)
+    http_breaker_threshold: int = int(os.getenv("HTTP_BREAKER_THRESHOLD", "5"))
+    http_breaker_cooldown_sec: float = float(os.getenv("HTTP_BREAKER_COOLDOWN_SEC", "30"))
+    # Per-host token buckets: "host[:port]=calls/seconds,..." (TVmaze allows ~20 calls / 10 s)
+    http_rate_limits: str = os.getenv("HTTP_RATE_LIMITS", "api.tvmaze.com=20/10")
+    http_retry_after_max_sec: float = float(os.getenv("HTTP_RETRY_AFTER_MAX_SEC", "30"))  # 0 = never wait/retry on 429
+    # Conditional-request cache for Arr/TVmaze GETs (ETag / Last-Modified revalidation); 0 = off
+    http_cache_max_bytes: int = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
     # -------- Extension Policy (customizable) --------
     # Strategy:
     #   "block" (default): allow everything EXCEPT what's in blocked list
@@ -144,12 +293,26 @@ class Config:
     allowed_exts: Set[str] = None  # set in __post_init__
     blocked_exts: Set[str] = None  # set in __post_init__
     exts_file: str = os.getenv("GUARD_EXTS_FILE", "/config/extensions.json")
+    # Optional JSON file of Config field overrides, e.g. {"min_keepable_video_mb": 100};
+    # applied last (after env). Both files are polled for changes by long-running modes.
+    config_file: str = os.getenv("GUARD_CONFIG_FILE", "")
+    reload_interval_sec: float = float(os.getenv("GUARD_RELOAD_INTERVAL_SEC", "10"))  # 0 = no hot reload
     # Enforcement:
     #   - If ALL files are disallowed by policy -> delete (default True)
     #   - If ANY file is disallowed -> delete (default False)
     ext_delete_if_all_blocked: bool = os.getenv("GUARD_EXT_DELETE_IF_ALL_BLOCKED", "1") in ("1","true","yes")
     ext_delete_if_any_blocked: bool = os.getenv("GUARD_EXT_DELETE_IF_ANY_BLOCKED", "0") in ("1","true","yes")
     ext_violation_tag: str = os.getenv("GUARD_EXT_VIOLATION_TAG", "trash:ext")
+    # Selective download: when only SOME files are disallowed, set them to priority 0 and keep the rest
+    # (takes precedence over GUARD_EXT_DELETE_IF_ANY_BLOCKED; all-disallowed torrents are still deleted)
+    ext_selective: bool = os.getenv("GUARD_EXT_SELECTIVE", "0") in ("1","true","yes")
+
+    # Name prefilter: regexes (";"-separated, case-insensitive) tried on the torrent name right after the stop.
+    # Reject -> tag trash:name + blocklist + delete before any Arr/metadata work; allow -> skip the ISO/ext check.
+    name_prefilter: bool = os.getenv("GUARD_NAME_PREFILTER", "0") in ("1","true","yes")
+    name_reject_patterns: str = os.getenv("GUARD_NAME_REJECT",
+        r"(^|[ ._-])BDMV([ ._-]|$);COMPLETE[ ._-]?BLU-?RAY;(^|[ ._-])VIDEO_TS([ ._-]|$);\.(iso|img|exe|msi|bat|scr)$")
+    name_allow_patterns: str = os.getenv("GUARD_NAME_ALLOW", "")
 
     # Disc-image set (used for ISO/BDMV detection); can be overridden
     disc_exts_env: str = os.getenv("GUARD_DISC_EXTS", "")  # e.g. "iso,img,mdf,toast"
@@ -204,10 +367,37 @@ class Config:
         if env_strategy in ("block","allow"):
             self.ext_strategy = env_strategy
 
+        if self.config_file:
+            self._apply_config_file()
+
         log.info("Extension policy | strategy=%s | allowed=%d | blocked=%d | enforce(any=%s, all=%s)",
                  self.ext_strategy, len(self.allowed_exts), len(self.blocked_exts),
                  self.ext_delete_if_any_blocked, self.ext_delete_if_all_blocked)
 
+    def _apply_config_file(self) -> None:
+        """Override fields from GUARD_CONFIG_FILE; values are coerced to the field's current type."""
+        if not os.path.isfile(self.config_file):
+            log.warning("Config file %s not found; ignoring.", self.config_file)
+            return
+        try:
+            with open(self.config_file, "r", encoding="utf-8") as f:
+                data = json.load(f) or {}
+        except Exception as e:
+            log.warning("Failed to read %s: %s (keeping env/defaults)", self.config_file, e)
+            return
+        names = {f.name for f in fields(self)} - {"config_file", "exts_file"}
+        applied = []
+        for key, raw in data.items():
+            if key not in names:
+                log.warning("Config file %s: unknown key '%s' ignored.", self.config_file, key)
+                continue
+            try:
+                setattr(self, key, _coerce_like(getattr(self, key), raw, key))
+                applied.append(key)
+            except (TypeError, ValueError) as e:
+                log.warning("Config file %s: bad value for '%s': %s", self.config_file, key, e)
+        log.info("Loaded config overrides from %s: %s", self.config_file, ", ".join(sorted(applied)) or "(none)")
+
     # --- Policy helpers ---
     def is_ext_allowed(self, ext: str) -> bool:
         if not ext:
@@ -221,12 +411,201 @@ class Config:
     def is_path_allowed(self, path: str) -> bool:
         return self.is_ext_allowed(_ext_of(path))
 
+    def policy_fingerprint(self) -> str:
+        """Digest of every setting IsoCleaner.evaluate depends on (cached verdicts are reused only if it matches)."""
+        parts = (self.ext_strategy, sorted(self.allowed_exts), sorted(self.blocked_exts), sorted(self.disc_exts),
+                 self.min_keepable_video_mb, self.ext_delete_if_all_blocked, self.ext_delete_if_any_blocked,
+                 self.ext_selective)
+        return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()[:16]
+
 
 # --------------------------- HTTP ---------------------------
 
+class CircuitOpenError(uerr.URLError):
+    """Raised instead of a network call while the target host's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker: CLOSED -> OPEN after `threshold` consecutive failures (timeouts,
+    connection errors, 5xx). While OPEN, calls short-circuit. After `cooldown` seconds one
+    HALF_OPEN probe is let through; success closes the breaker, failure re-opens it.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, host: str, threshold: int, cooldown: float):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.set(f"http_breaker_state[{self.host}]", state)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and (time.monotonic() - self.opened_at) >= self.cooldown:
+                self._set_state(self.HALF_OPEN)
+                log.info("HTTP breaker HALF-OPEN for %s; probing.", self.host)
+                return True
+            # OPEN within cooldown, or a HALF_OPEN probe already in flight
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                log.info("HTTP breaker CLOSED for %s.", self.host)
+                self._set_state(self.CLOSED)
+            self.failures = 0
+
+    def record_inconclusive(self) -> None:
+        """Call cut short on our side (decision deadline): counts neither way; a half-open probe may be retried at once."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.opened_at = time.monotonic() - self.cooldown
+                self._set_state(self.OPEN)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                log.warning("HTTP breaker OPEN for %s after %d consecutive failure(s); cooldown %.0fs.",
+                            self.host, self.failures, self.cooldown)
+                metrics.inc(f"http_breaker_opened[{self.host}]")
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+
+class TokenBucket:
+    """
+    Per-host pacing: `calls` tokens refilled evenly over `per_sec` seconds (calls=0 -> unlimited).
+    acquire() reserves a token and sleeps outside the lock until it is due, so concurrent callers
+    queue fairly. penalize() pushes the next slot out to honour a server's Retry-After.
+    """
+    def __init__(self, host: str, calls: int = 0, per_sec: float = 1.0):
+        self.host = host
+        self.capacity = float(calls)
+        self.rate = (calls / per_sec) if calls > 0 and per_sec > 0 else 0.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Block until a request may be sent; returns seconds waited. Raises DeadlineExceeded (returning the
+        reserved token) when the slot lies past the decision deadline: sending early would break the limit.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.blocked_until - now)
+            if self.rate > 0:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                self.tokens -= 1.0
+                if self.tokens < 0:
+                    wait = max(wait, -self.tokens / self.rate)
+            left = deadline_remaining()
+            if left is not None and wait > left:
+                if self.rate > 0:
+                    self.tokens += 1.0
+                metrics.inc(f"http_rate_deadline[{self.host}]")
+                raise DeadlineExceeded(f"decision deadline exceeded waiting {wait:.1f}s for a {self.host} rate slot")
+        if wait > 0:
+            metrics.inc(f"http_rate_waits[{self.host}]")
+            metrics.inc(f"http_rate_wait_seconds[{self.host}]", round(wait, 3))
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, seconds: float) -> None:
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def _parse_rate_limits(spec: str) -> Dict[str, Tuple[int, float]]:
+    """'api.tvmaze.com=20/10, sonarr:8989=10/1' -> {host: (calls, seconds)}; bad entries are skipped."""
+    out: Dict[str, Tuple[int, float]] = {}
+    for item in re.split(r"[,\s;]+", spec or ""):
+        m = re.match(r"^([^=]+)=(\d+)/(\d+(?:\.\d+)?)$", item.strip())
+        if m:
+            out[m.group(1).lower()] = (int(m.group(2)), float(m.group(3)))
+        elif item.strip():
+            log.warning("HTTP_RATE_LIMITS: ignoring malformed entry '%s'", item)
+    return out
+
+
+def _retry_after_seconds(e: uerr.HTTPError) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date), if any."""
+    val = (e.headers.get("Retry-After") if e.headers else None) or ""
+    val = val.strip()
+    if not val:
+        return None
+    if val.isdigit():
+        return float(val)
+    try:
+        dt = email.utils.parsedate_to_datetime(val)
+        return max(0.0, (dt - now_utc()).total_seconds())
+    except Exception:
+        return None
+
+
+def _is_upstream_failure(e: BaseException) -> bool:
+    """Timeouts, connection errors and 5xx count against a breaker; 4xx means the host is up."""
+    if isinstance(e, uerr.HTTPError):
+        return e.code >= 500
+    return isinstance(e, (uerr.URLError, OSError))
+
+
+class ResponseCache:
+    """
+    Byte-budgeted LRU of GET bodies with their validators (ETag / Last-Modified), keyed by URL + auth scope.
+    Only responses carrying a validator are stored; entries are always revalidated, never served blind.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[bytes, Optional[str], Optional[str]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str, headers: Dict[str, str]) -> Tuple[str, str]:
+        auth = "|".join(f"{k.lower()}={v}" for k, v in sorted(headers.items())
+                        if k.lower() in ("authorization", "x-api-key", "cookie"))
+        return url, hashlib.sha1(auth.encode("utf-8")).hexdigest()[:12] if auth else ""
+
+    def get(self, key: Tuple[str, str]) -> Optional[Tuple[bytes, Optional[str], Optional[str]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Tuple[str, str], body: bytes, etag: Optional[str], last_modified: Optional[str]) -> None:
+        if not (etag or last_modified) or len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= len(old[0])
+            self._entries[key] = (body, etag, last_modified)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes and self._entries:
+                _, (b, _, _) = self._entries.popitem(last=False)
+                self._bytes -= len(b)
+            metrics.set("http_cache_bytes", self._bytes)
+
+
 class HttpClient:
-    """Small urllib wrapper with cookie jar, TLS toggle, and defaults."""
-    def __init__(self, ignore_tls: bool, user_agent: str):
+    """Small urllib wrapper with cookie jar, TLS toggle, per-host circuit breakers and rate limits, and defaults."""
+    def __init__(self, ignore_tls: bool, user_agent: str, breaker_threshold: int = 0, breaker_cooldown_sec: float = 30.0,
+                 rate_limits: Optional[Dict[str, Tuple[int, float]]] = None, retry_after_max_sec: float = 0.0,
+                 cache_max_bytes: int = 0):
         self.cj = cookiejar.CookieJar()
         if ignore_tls:
             ctx = ssl._create_unverified_context()
@@ -236,20 +615,116 @@ class HttpClient:
         else:
             self.opener = ureq.build_opener(ureq.HTTPCookieProcessor(self.cj))
         self.user_agent = user_agent
-
-    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: int = 20) -> bytes:
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown_sec = breaker_cooldown_sec
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        self.rate_limits = rate_limits or {}
+        self.retry_after_max_sec = retry_after_max_sec
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.cache = ResponseCache(cache_max_bytes) if cache_max_bytes > 0 else None
+
+    @classmethod
+    def from_config(cls, cfg: "Config", breakers: bool = True) -> "HttpClient":
+        return cls(cfg.ignore_tls, cfg.user_agent,
+                   cfg.http_breaker_threshold if breakers else 0, cfg.http_breaker_cooldown_sec,
+                   _parse_rate_limits(cfg.http_rate_limits), cfg.http_retry_after_max_sec, cfg.http_cache_max_bytes)
+
+    def _breaker(self, host: str) -> Optional[CircuitBreaker]:
+        if self.breaker_threshold <= 0:
+            return None
+        with self._breakers_lock:
+            b = self._breakers.get(host)
+            if b is None:
+                b = self._breakers[host] = CircuitBreaker(host, self.breaker_threshold, self.breaker_cooldown_sec)
+            return b
+
+    def _bucket(self, host: str) -> TokenBucket:
+        with self._breakers_lock:
+            b = self._buckets.get(host)
+            if b is None:
+                limit = self.rate_limits.get(host) or self.rate_limits.get(host.split(":")[0]) or (0, 1.0)
+                b = self._buckets[host] = TokenBucket(host, *limit)
+            return b
+
+    def _open(self, req: ureq.Request, timeout: float) -> bytes:
+        return self._open_response(req, timeout)[0]
+
+    def _open_response(self, req: ureq.Request, timeout: float) -> Tuple[bytes, Any]:
+        """Single choke point for all requests; applies the host's circuit breaker and rate limit."""
+        host = uparse.urlsplit(req.full_url).netloc.lower()
+        breaker = self._breaker(host)
+        bucket = self._bucket(host)
+        retried = False
+        while True:
+            # Rate slot first (may wait, or raise if it lies past the deadline); the timeout is then
+            # capped to what's left after the wait, and the breaker is asked last so a half-open probe
+            # it lets through is always sent
+            bucket.acquire()
+            req_timeout = deadline_timeout(timeout, host)
+            if breaker and not breaker.allow():
+                metrics.inc(f"http_breaker_rejected[{host}]")
+                raise CircuitOpenError(f"circuit open for {host}")
+            try:
+                with self.opener.open(req, timeout=req_timeout) as r:
+                    body, resp_headers = r.read(), r.headers
+            except Exception as e:
+                left = deadline_remaining()
+                if left is not None and left <= 0 and not isinstance(e, uerr.HTTPError):
+                    # Timed out because the deadline capped the timeout: not the host's fault
+                    if breaker:
+                        breaker.record_inconclusive()
+                    raise DeadlineExceeded(f"decision deadline exceeded during {host}") from e
+                if breaker:
+                    if _is_upstream_failure(e):
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                # Honour Retry-After on 429/503 once, if the server asks for a bearable pause
+                if isinstance(e, uerr.HTTPError) and e.code in (429, 503) and not retried:
+                    delay = _retry_after_seconds(e)
+                    if delay is None and e.code == 429:
+                        delay = 1.0
+                    left = deadline_remaining()
+                    if (delay is not None and 0 < self.retry_after_max_sec and delay <= self.retry_after_max_sec
+                            and (left is None or delay < left)):
+                        metrics.inc(f"http_retry_after[{host}]")
+                        log.info("HTTP %d from %s; pausing host for %.1fs (Retry-After).", e.code, host, delay)
+                        bucket.penalize(delay)
+                        retried = True
+                        continue
+                raise
+            if breaker:
+                breaker.record_success()
+            return body, resp_headers
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: int = 20, cache: bool = False) -> bytes:
+        """`cache=True`: revalidate against the response cache (304 -> cached body) when one is configured."""
         h = {"User-Agent": self.user_agent}
         if headers: h.update(headers)
-        req = ureq.Request(url, headers=h)
-        with self.opener.open(req, timeout=timeout) as r:
-            return r.read()
+        if not (cache and self.cache):
+            return self._open(ureq.Request(url, headers=h), timeout)
+        key = ResponseCache.key(url, h)
+        entry = self.cache.get(key)
+        if entry:
+            if entry[1]: h["If-None-Match"] = entry[1]
+            if entry[2]: h["If-Modified-Since"] = entry[2]
+        try:
+            body, resp_headers = self._open_response(ureq.Request(url, headers=h), timeout)
+        except uerr.HTTPError as e:
+            if e.code == 304 and entry:
+                metrics.inc("http_cache_revalidated")
+                return entry[0]
+            raise
+        metrics.inc("http_cache_misses" if not entry else "http_cache_stale")
+        self.cache.put(key, body, resp_headers.get("ETag"), resp_headers.get("Last-Modified"))
+        return body
 
     def post_bytes(self, url: str, payload: bytes, headers: Optional[Dict[str, str]] = None, timeout: int = 20) -> bytes:
         h = {"User-Agent": self.user_agent}
         if headers: h.update(headers)
         req = ureq.Request(url, data=payload, headers=h)
-        with self.opener.open(req, timeout=timeout) as r:
-            return r.read()
+        return self._open(req, timeout)
 
     def post_form(self, url: str, data: Dict[str, Any], headers: Optional[Dict[str, str]] = None, timeout: int = 20) -> bytes:
         payload = uparse.urlencode(data or {}).encode()
@@ -261,12 +736,17 @@ class HttpClient:
         if headers: h.update(headers)
         return self.post_bytes(url, payload, h, timeout)
 
+    def put_json(self, url: str, obj: Dict[str, Any], headers: Optional[Dict[str, str]] = None, timeout: int = 20) -> bytes:
+        h = {"User-Agent": self.user_agent, "Content-Type": "application/json"}
+        if headers: h.update(headers)
+        req = ureq.Request(url, data=json.dumps(obj or {}).encode(), headers=h, method="PUT")
+        return self._open(req, timeout)
+
     def delete(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: int = 20) -> bytes:
         h = {"User-Agent": self.user_agent}
         if headers: h.update(headers)
         req = ureq.Request(url, headers=h, method="DELETE")
-        with self.opener.open(req, timeout=timeout) as r:
-            return r.read()
+        return self._open(req, timeout)
 
 
 # --------------------------- qBittorrent ---------------------------
@@ -305,14 +785,17 @@ class QbitClient:
                 continue
         log.warning("qB: could not start/resume %s", h)
 
-    def stop(self, h: str) -> None:
-        """Stop torrent, trying /stop then /pause."""
+    def stop(self, h: str) -> bool:
+        """Stop torrent, trying /stop then /pause. False if neither worked."""
         for p in ("/api/v2/torrents/stop", "/api/v2/torrents/pause"):
             try:
-                self.post(p, {"hashes": h}); return
+                self.post(p, {"hashes": h}); return True
+            except DeadlineExceeded:
+                raise
             except Exception:
                 continue
         log.warning("qB: could not stop/pause %s", h)
+        return False
 
     def delete(self, h: str, delete_files: bool) -> None:
         self.post("/api/v2/torrents/delete", {"hashes": h, "deleteFiles": "true" if delete_files else "false"})
@@ -333,9 +816,28 @@ class QbitClient:
         arr = self.get_json("/api/v2/torrents/info", {"hashes": h}) or []
         return arr[0] if arr else None
 
+    def torrents(self, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """List torrents (/torrents/info) with optional filter/sort/limit/offset params."""
+        return self.get_json("/api/v2/torrents/info", params) or []
+
     def files(self, h: str) -> List[Dict[str, Any]]:
         return self.get_json("/api/v2/torrents/files", {"hash": h}) or []
 
+    def categories_matching(self, wanted: Set[str]) -> List[str]:
+        """qB's own spelling of the (lowercased) `wanted` categories; its category filter is case-sensitive."""
+        try:
+            names = list((self.get_json("/api/v2/torrents/categories") or {}).keys())
+        except Exception as e:
+            log.warning("qB: could not list categories (%s); using configured names as-is.", e)
+            return sorted(wanted)
+        known = {n.lower() for n in names}
+        return sorted([n for n in names if n.lower() in wanted] + [c for c in wanted if c not in known])
+
+    def set_file_priority(self, h: str, ids: Sequence[int], priority: int) -> None:
+        """Batch-set priority for file indices (0 = do not download)."""
+        if ids:
+            self.post("/api/v2/torrents/filePrio", {"hash": h, "id": "|".join(str(i) for i in ids), "priority": priority})
+
     def trackers(self, h: str) -> List[Dict[str, Any]]:
         return self.get_json("/api/v2/torrents/trackers", {"hash": h}) or []
 
@@ -359,7 +861,7 @@ class BaseArr:
     def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
         url = f"{self.base}/api/v3{path}"
         if params: url += "?" + uparse.urlencode(params, doseq=True)
-        raw = self.http.get(url, headers={"X-Api-Key": self.key}, timeout=self.timeout)
+        raw = self.http.get(url, headers={"X-Api-Key": self.key}, timeout=self.timeout, cache=True)
         return None if not raw else json.loads(raw.decode("utf-8"))
 
     def _post_empty(self, path: str) -> None:
@@ -371,14 +873,29 @@ class BaseArr:
                 return
             except Exception as e:
                 last = e
-                time.sleep(min(2**a, 8))
+                deadline_sleep(min(2**a, 8))
         raise last
 
+    def _send_json(self, method: str, path: str, obj: Dict[str, Any]) -> Any:
+        url = f"{self.base}/api/v3{path}"
+        send = self.http.put_json if method == "PUT" else self.http.post_json
+        raw = send(url, obj, headers={"X-Api-Key": self.key}, timeout=self.timeout)
+        return None if not raw else json.loads(raw.decode("utf-8"))
+
     def _delete(self, path: str, query: Dict[str, Any]) -> None:
         url = f"{self.base}/api/v3{path}"
         if query: url += "?" + uparse.urlencode(query, doseq=True)
         self.http.delete(url, headers={"X-Api-Key": self.key}, timeout=self.timeout)
 
+    def release_profiles(self) -> List[Dict[str, Any]]:
+        return self._get("/releaseprofile") or []
+
+    def save_release_profile(self, profile: Dict[str, Any]) -> Dict[str, Any]:
+        """Create (no id) or update a release profile; returns the stored profile."""
+        if profile.get("id"):
+            return self._send_json("PUT", f"/releaseprofile/{profile['id']}", profile) or profile
+        return self._send_json("POST", "/releaseprofile", profile) or profile
+
     def history_for_download(self, download_id: str) -> List[Dict[str, Any]]:
         """Return history rows for a given downloadId (with fallback page scan)."""
         try:
@@ -425,8 +942,10 @@ class BaseArr:
 
 class SonarrClient(BaseArr):
     """Sonarr v3 client with blocklist helpers."""
-    def __init__(self, cfg: Config, http: HttpClient):
-        super().__init__(cfg.sonarr_url, cfg.sonarr_apikey, http, cfg.sonarr_timeout_sec, cfg.sonarr_retries, "Sonarr")
+    def __init__(self, cfg: Config, http: HttpClient, url: Optional[str] = None, apikey: Optional[str] = None,
+                 timeout: Optional[int] = None, retries: Optional[int] = None, name: str = "Sonarr"):
+        super().__init__(cfg.sonarr_url if url is None else url, cfg.sonarr_apikey if apikey is None else apikey, http,
+                         timeout or cfg.sonarr_timeout_sec, retries or cfg.sonarr_retries, name)
 
     def blocklist_download(self, download_id: str) -> None:
         """Blocklist a release by failing one grabbed history row; falls back to queue removal with blocklist=true."""
@@ -459,6 +978,28 @@ class SonarrClient(BaseArr):
             log.warning("Sonarr: episode %s fetch failed: %s", episode_id, e)
             return None
 
+    def episodes(self, episode_ids: Sequence[int], chunk: int = 100) -> Dict[int, Dict[str, Any]]:
+        """Batched /episode?episodeIds=... lookup (one round trip per `chunk` ids); ids that fail are omitted."""
+        out: Dict[int, Dict[str, Any]] = {}
+        ids = sorted(set(int(i) for i in episode_ids))
+        for i in range(0, len(ids), chunk):
+            part = ids[i:i + chunk]
+            try:
+                rows = self._get("/episode", {"episodeIds": part}) or []
+            except Exception as e:
+                log.warning("Sonarr: bulk episode fetch (%d ids) failed: %s", len(part), e)
+                continue
+            for ep in rows:
+                if isinstance(ep, dict) and ep.get("id") is not None:
+                    out[int(ep["id"])] = ep
+        return out
+
+    def calendar(self, start: datetime.datetime, end: datetime.datetime) -> List[Dict[str, Any]]:
+        """Episodes airing in [start, end], monitored or not (raises on failure)."""
+        fmt = "%Y-%m-%dT%H:%M:%SZ"
+        return self._get("/calendar", {"start": start.strftime(fmt), "end": end.strftime(fmt),
+                                       "unmonitored": "true"}) or []
+
     def series(self, series_id: int) -> Optional[Dict[str, Any]]:
         try:
             return self._get(f"/series/{series_id}")
@@ -468,8 +1009,10 @@ class SonarrClient(BaseArr):
 
 class RadarrClient(BaseArr):
     """Radarr v3 client with blocklist helpers (used on ISO deletes)."""
-    def __init__(self, cfg: Config, http: HttpClient):
-        super().__init__(cfg.radarr_url, cfg.radarr_apikey, http, cfg.radarr_timeout_sec, cfg.radarr_retries, "Radarr")
+    def __init__(self, cfg: Config, http: HttpClient, url: Optional[str] = None, apikey: Optional[str] = None,
+                 timeout: Optional[int] = None, retries: Optional[int] = None, name: str = "Radarr"):
+        super().__init__(cfg.radarr_url if url is None else url, cfg.radarr_apikey if apikey is None else apikey, http,
+                         timeout or cfg.radarr_timeout_sec, retries or cfg.radarr_retries, name)
 
     def blocklist_download(self, download_id: str) -> None:
         """Blocklist a release by failing one grabbed history row; falls back to queue removal with blocklist=true."""
@@ -495,6 +1038,78 @@ class RadarrClient(BaseArr):
             log.info("Radarr: nothing to fail or in queue for downloadId=%s", download_id)
 
 
+# --------------------------- Arr routing ---------------------------
+
+@dataclass
+class ArrInstance:
+    name: str
+    kind: str              # "sonarr" | "radarr"
+    categories: Set[str]
+    client: BaseArr
+
+
+class ArrRouter:
+    """
+    Category -> Sonarr/Radarr instance. Built from ARR_INSTANCES; each configured instance gets its own
+    HttpClient (session, breaker, response cache). Without ARR_INSTANCES it is the single SONARR_*/RADARR_* pair
+    on the shared client, i.e. the historical behaviour.
+    """
+    KINDS = {"sonarr": SonarrClient, "radarr": RadarrClient}
+
+    def __init__(self, instances: List[ArrInstance], key: Tuple = ()):
+        self.instances = instances
+        self.key = key
+
+    @staticmethod
+    def _key(cfg: Config) -> Tuple:
+        return (cfg.arr_instances, cfg.sonarr_url, cfg.sonarr_apikey, tuple(sorted(cfg.sonarr_categories)),
+                cfg.radarr_url, cfg.radarr_apikey, tuple(sorted(cfg.radarr_categories)),
+                cfg.sonarr_timeout_sec, cfg.sonarr_retries, cfg.radarr_timeout_sec, cfg.radarr_retries)
+
+    @classmethod
+    def from_config(cls, cfg: Config, http: HttpClient, previous: Optional["ArrRouter"] = None) -> "ArrRouter":
+        key = cls._key(cfg)
+        if previous is not None and previous.key == key:
+            return previous  # keep warm sessions/caches across reloads
+        defaults = [ArrInstance("sonarr", "sonarr", set(cfg.sonarr_categories), SonarrClient(cfg, http)),
+                    ArrInstance("radarr", "radarr", set(cfg.radarr_categories), RadarrClient(cfg, http))]
+        spec = cfg.arr_instances.strip()
+        if not spec:
+            return cls(defaults, key)
+        try:
+            if not spec.startswith("["):
+                with open(spec, "r", encoding="utf-8") as f:
+                    spec = f.read()
+            instances = []
+            for i, d in enumerate(json.loads(spec)):
+                kind = str(d.get("kind", "")).strip().lower()
+                if kind not in cls.KINDS:
+                    raise ValueError(f"entry {i}: kind must be sonarr or radarr")
+                name = str(d.get("name") or f"{kind}{i}")
+                cats = d.get("categories") or []
+                cats = cats.split(",") if isinstance(cats, str) else cats
+                client = cls.KINDS[kind](cfg, HttpClient.from_config(cfg), url=str(d.get("url") or "").rstrip("/"),
+                                         apikey=str(d.get("apikey") or ""), timeout=d.get("timeout"),
+                                         retries=d.get("retries"), name=f"{kind.capitalize()}[{name}]")
+                instances.append(ArrInstance(name, kind, {str(c).strip().lower() for c in cats if str(c).strip()}, client))
+        except Exception as e:
+            log.error("ARR_INSTANCES invalid (%s); using SONARR_*/RADARR_* settings.", e)
+            return cls(defaults, key)
+        log.info("Arr routing: %s", "; ".join(f"{i.name}({i.kind})<-{','.join(sorted(i.categories)) or '-'}" for i in instances))
+        return cls(instances, key)
+
+    def of_kind(self, kind: str) -> List[ArrInstance]:
+        return [i for i in self.instances if i.kind == kind]
+
+    def first(self, kind: str) -> Optional[BaseArr]:
+        found = self.of_kind(kind)
+        return found[0].client if found else None
+
+    def clients_for(self, category_norm: str) -> List[BaseArr]:
+        """Every enabled instance that owns this category."""
+        return [i.client for i in self.instances if category_norm in i.categories and i.client.enabled]
+
+
 # --------------------------- Utilities ---------------------------
 
 def now_utc() -> datetime.datetime:
@@ -518,8 +1133,53 @@ def domain_from_url(u: str) -> str:
         return u.lower()
 
 
+class SingleFlight:
+    """Coalesces concurrent calls for the same key: one caller runs fn, the others wait and share its result."""
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result: Any = None
+            self.error: Optional[BaseException] = None
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, "SingleFlight._Call"] = {}
+
+    def do(self, key: Any, fn) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = SingleFlight._Call()
+        if not leader:
+            metrics.inc(f"{self.name}_shared")
+            left = deadline_remaining()
+            if not call.done.wait(None if left is None else max(0.0, left)):
+                raise DeadlineExceeded(f"decision deadline exceeded waiting on {self.name}")
+            if isinstance(call.error, DeadlineExceeded):
+                return self.do(key, fn)  # the leader ran out of its own budget, not ours
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
 # --------------------------- Internet Airdates ---------------------------
 
+class ProviderUnavailable(Exception):
+    """TVmaze/TheTVDB didn't answer (timeout, open breaker, 5xx, bad payload); unlike a 404, not an answer to cache."""
+
+
 class InternetDates:
     """Optional TVmaze/TheTVDB cross-check to supplement Sonarr's airDateUtc."""
     def __init__(self, cfg: Config, http: HttpClient, sonarr: SonarrClient):
@@ -528,38 +1188,42 @@ class InternetDates:
         self.sonarr = sonarr
         self._tvdb_token = cfg.tvdb_bearer.strip()
 
-    def _get(self, url: str, timeout: int) -> Any:
-        raw = self.http.get(url, timeout=timeout)
-        return None if not raw else json.loads(raw.decode("utf-8"))
+    def _get(self, url: str, timeout: int, headers: Optional[Dict[str, str]] = None) -> Any:
+        """JSON body, None on 404 (provider has no such item); other failures raise ProviderUnavailable."""
+        try:
+            raw = self.http.get(url, headers=headers, timeout=timeout, cache=True)
+            return None if not raw else json.loads(raw.decode("utf-8"))
+        except DeadlineExceeded:
+            raise
+        except uerr.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise ProviderUnavailable(f"{uparse.urlsplit(url).netloc}: HTTP {e.code}") from e
+        except Exception as e:
+            raise ProviderUnavailable(f"{uparse.urlsplit(url).netloc}: {e}") from e
 
     # TVmaze
     def tvmaze_show_id(self, series: Dict[str, Any]) -> Optional[int]:
         tvdb = series.get("tvdbId") or None
         imdb = series.get("imdbId") or None
         title = series.get("title") or None
-        try:
-            if tvdb:
-                j = self._get(f"{self.cfg.tvmaze_base}/lookup/shows?thetvdb={int(tvdb)}", self.cfg.tvmaze_timeout)
-                if isinstance(j, dict) and j.get("id"): return int(j["id"])
-            if imdb and not str(imdb).startswith("tt"):
-                imdb = "tt" + str(imdb)
-            if imdb:
-                j = self._get(f"{self.cfg.tvmaze_base}/lookup/shows?imdb={uparse.quote(str(imdb))}", self.cfg.tvmaze_timeout)
-                if isinstance(j, dict) and j.get("id"): return int(j["id"])
-            if title:
-                j = self._get(f"{self.cfg.tvmaze_base}/singlesearch/shows?q={uparse.quote(title)}", self.cfg.tvmaze_timeout)
-                if isinstance(j, dict) and j.get("id"): return int(j["id"])
-        except Exception:
-            return None
+        if tvdb:
+            j = self._get(f"{self.cfg.tvmaze_base}/lookup/shows?thetvdb={int(tvdb)}", self.cfg.tvmaze_timeout)
+            if isinstance(j, dict) and j.get("id"): return int(j["id"])
+        if imdb and not str(imdb).startswith("tt"):
+            imdb = "tt" + str(imdb)
+        if imdb:
+            j = self._get(f"{self.cfg.tvmaze_base}/lookup/shows?imdb={uparse.quote(str(imdb))}", self.cfg.tvmaze_timeout)
+            if isinstance(j, dict) and j.get("id"): return int(j["id"])
+        if title:
+            j = self._get(f"{self.cfg.tvmaze_base}/singlesearch/shows?q={uparse.quote(title)}", self.cfg.tvmaze_timeout)
+            if isinstance(j, dict) and j.get("id"): return int(j["id"])
         return None
 
     def tvmaze_episode_airstamp(self, tm_id: int, season: int, number: int) -> Optional[datetime.datetime]:
-        try:
-            j = self._get(f"{self.cfg.tvmaze_base}/shows/{tm_id}/episodebynumber?season={season}&number={number}", self.cfg.tvmaze_timeout)
-            s = j.get("airstamp") if isinstance(j, dict) else None
-            return parse_iso_utc(s) if s else None
-        except Exception:
-            return None
+        j = self._get(f"{self.cfg.tvmaze_base}/shows/{tm_id}/episodebynumber?season={season}&number={number}", self.cfg.tvmaze_timeout)
+        s = j.get("airstamp") if isinstance(j, dict) else None
+        return parse_iso_utc(s) if s else None
 
     # TVDB
     def _tvdb_login(self) -> Optional[str]:
@@ -573,51 +1237,253 @@ class InternetDates:
             r = self.http.post_json(f"{self.cfg.tvdb_base}/login", obj=body, timeout=self.cfg.tvdb_timeout)
             j = json.loads(r.decode("utf-8")) if r else {}
             token = j.get("data", {}).get("token") or j.get("token")
-            if token:
-                self._tvdb_token = token
-                return token
-        except Exception:
-            return None
-        return None
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise ProviderUnavailable(f"TheTVDB login: {e}") from e
+        if not token:
+            raise ProviderUnavailable("TheTVDB login returned no token")
+        self._tvdb_token = token
+        return token
 
     def tvdb_episode_airstamp(self, tvdb_series_id: int, season: int, number: int) -> Optional[datetime.datetime]:
         token = self._tvdb_login()
         if not token: return None
         order = self.cfg.tvdb_order if self.cfg.tvdb_order in ("default","official") else "default"
         lang = self.cfg.tvdb_language or "eng"
-        try:
-            # page through a few pages
-            for page in range(0, 10):
-                url = f"{self.cfg.tvdb_base}/series/{tvdb_series_id}/episodes/{order}/{lang}?page={page}"
-                raw = self.http.get(url, headers={"Authorization":"Bearer "+token}, timeout=self.cfg.tvdb_timeout)
-                j = json.loads(raw.decode("utf-8")) if raw else {}
-                for ep in (j.get("data") or []):
-                    sn = ep.get("seasonNumber"); en = ep.get("number")
-                    if sn == season and en == number:
-                        s = ep.get("airstamp") or ep.get("firstAired") or ep.get("airDate") or ep.get("date")
-                        if not s: return None
-                        if isinstance(s, str) and s.endswith("Z"): s = s[:-1] + "+00:00"
-                        if isinstance(s, str) and len(s) == 10 and s[4] == "-" and s[7] == "-":
-                            s += "T00:00:00+00:00"
-                        try: return datetime.datetime.fromisoformat(s)
-                        except Exception: return None
-                if not j.get("data"): break
-        except Exception:
-            return None
+        # page through a few pages
+        for page in range(0, 10):
+            url = f"{self.cfg.tvdb_base}/series/{tvdb_series_id}/episodes/{order}/{lang}?page={page}"
+            j = self._get(url, self.cfg.tvdb_timeout, headers={"Authorization":"Bearer "+token})
+            data = (j.get("data") or []) if isinstance(j, dict) else []
+            if isinstance(data, dict):
+                data = data.get("episodes") or []
+            for ep in data:
+                if not isinstance(ep, dict):
+                    continue
+                sn = ep.get("seasonNumber"); en = ep.get("number")
+                if sn == season and en == number:
+                    s = ep.get("airstamp") or ep.get("firstAired") or ep.get("airDate") or ep.get("date")
+                    if not s: return None
+                    if isinstance(s, str) and s.endswith("Z"): s = s[:-1] + "+00:00"
+                    if isinstance(s, str) and len(s) == 10 and s[4] == "-" and s[7] == "-":
+                        s += "T00:00:00+00:00"
+                    try: return datetime.datetime.fromisoformat(s)
+                    except Exception: return None
+            if not data: break
         return None
 
 
 # --------------------------- Pre-Air Gate ---------------------------
 
+class AirTimeCache:
+    """
+    Per-episode cache of resolved air times whose expiry comes from the data itself.
+    An entry is valid until `airtime - EARLY_GRACE_HOURS` (before that the verdict can't
+    change); aired episodes never expire; unknown air times get a short TTL.
+    """
+    def __init__(self, grace_hours: float, unknown_ttl_sec: float, max_entries: int):
+        self.grace_sec = grace_hours * 3600.0
+        self.unknown_ttl_sec = unknown_ttl_sec
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Any) -> Tuple[bool, Any]:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                metrics.inc("preair_cache_miss")
+                return False, None
+            expires_at, value = hit
+            if time.time() >= expires_at:
+                del self._data[key]
+                metrics.inc("preair_cache_expired")
+                return False, None
+            self._data.move_to_end(key)
+            metrics.inc("preair_cache_hit")
+            return True, value
+
+    def contains(self, key: Any) -> bool:
+        """Fresh entry present? (no metrics, no LRU touch; for prefetch probes)"""
+        with self._lock:
+            hit = self._data.get(key)
+            return hit is not None and time.time() < hit[0]
+
+    def put(self, key: Any, value: Any, airtime: Optional[datetime.datetime]) -> None:
+        if self.max_entries <= 0:
+            return
+        now = time.time()
+        if airtime is None:
+            expires_at = now + self.unknown_ttl_sec
+        elif airtime <= now_utc():
+            expires_at = float("inf")
+        else:
+            expires_at = airtime.timestamp() - self.grace_sec
+        if expires_at <= now:
+            return  # already inside the grace window; must be re-evaluated each time
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            metrics.set("preair_cache_entries", len(self._data))
+
+
+class CalendarIndex:
+    """
+    Episode id -> Sonarr episode record for everything airing in a rolling window
+    [now - PREAIR_CALENDAR_PAST_HOURS, now + EARLY_HARD_LIMIT_HOURS + 1 refresh], rebuilt from
+    /calendar by a background thread. Only consulted while fresh (last refresh within 3 intervals).
+    """
+    CONFIG_KEYS = ("preair_calendar_refresh_sec", "preair_calendar_past_hours", "early_hard_limit_hours")
+
+    def __init__(self, cfg: Config, sonarr: SonarrClient):
+        self.cfg = cfg
+        self.sonarr = sonarr
+        self.interval = cfg.preair_calendar_refresh_sec
+        self._episodes: Dict[int, Dict[str, Any]] = {}
+        self._refreshed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> None:
+        now = now_utc()
+        start = now - datetime.timedelta(hours=self.cfg.preair_calendar_past_hours)
+        end = now + datetime.timedelta(hours=self.cfg.early_hard_limit_hours, seconds=self.interval)
+        rows = self.sonarr.calendar(start, end)
+        self._episodes = {int(ep["id"]): ep for ep in rows if isinstance(ep, dict) and ep.get("id") is not None}
+        self._refreshed = time.monotonic()
+        metrics.set("preair_calendar_episodes", len(self._episodes))
+        log.debug("Pre-air calendar: %d episode(s) between %s and %s.", len(self._episodes), start, end)
+
+    def get(self, eid: int) -> Optional[Dict[str, Any]]:
+        if not self._refreshed or time.monotonic() - self._refreshed > 3 * self.interval:
+            return None
+        ep = self._episodes.get(eid)
+        metrics.inc("preair_calendar_hit" if ep else "preair_calendar_miss")
+        return ep
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                log.warning("Pre-air calendar refresh failed: %s", e)
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._loop, name="preair-calendar", daemon=True)
+            self._thread.start()
+            log.info("Pre-air calendar prefetch every %.0fs (window -%.0fh/+%.0fh).", self.interval,
+                     self.cfg.preair_calendar_past_hours, self.cfg.early_hard_limit_hours)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
 class PreAirGate:
     """Implements the pre-air decision logic using Sonarr (and optional internet cross-checks)."""
-    def __init__(self, cfg: Config, sonarr: SonarrClient, internet: InternetDates):
+    UNKNOWN_HOURS = 99999.0
+
+    def __init__(self, cfg: Config, sonarr: SonarrClient, internet: InternetDates,
+                 cache: Optional[AirTimeCache] = None, flight: Optional[SingleFlight] = None,
+                 calendar: Optional[CalendarIndex] = None, categories: Optional[Set[str]] = None):
         self.cfg = cfg
         self.sonarr = sonarr
         self.internet = internet
+        self.calendar = calendar
+        self.categories = cfg.sonarr_categories if categories is None else categories
+        # Overlapping grabs of the same episode (several releases, pack + singles) share lookups
+        self.flight = flight or SingleFlight("preair_lookup")
+        self.cache = cache or AirTimeCache(cfg.early_grace_hours, cfg.preair_cache_unknown_ttl_sec, cfg.preair_cache_max_entries)
 
     def should_apply(self, category_norm: str) -> bool:
-        return self.cfg.enable_preair and self.sonarr.enabled and (category_norm in self.cfg.sonarr_categories)
+        return self.cfg.enable_preair and self.sonarr.enabled and (category_norm in self.categories)
+
+    # --- Per-episode lookups (cached and coalesced by episode id) ---
+    def _cached(self, key: Tuple[str, int], fetch, airtime_of) -> Any:
+        hit, value = self.cache.get(key)
+        if hit:
+            return value
+        def load():
+            v = fetch()
+            if v:  # failed Sonarr fetches come back empty; don't pin them
+                self.cache.put(key, v, airtime_of(v))
+            return v
+        return self.flight.do(key, load)
+
+    def _episode(self, eid: int) -> Dict[str, Any]:
+        return self._cached(("episode", eid), lambda: self.sonarr.episode(eid) or {},
+                            lambda ep: parse_iso_utc(ep.get("airDateUtc")) if ep else None)
+
+    def _prefetch_episodes(self, episode_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        """Load all uncached ids with one bulk Sonarr call (and cache them); anything it misses falls back to _episode."""
+        missing = [eid for eid in episode_ids if not self.cache.contains(("episode", eid))]
+        if len(missing) < 2:
+            return {}
+        found = self.sonarr.episodes(missing)
+        for eid, ep in found.items():
+            self.cache.put(("episode", eid), ep, parse_iso_utc(ep.get("airDateUtc")))
+        metrics.inc("sonarr_bulk_episode_calls")
+        metrics.inc("sonarr_bulk_episodes", len(found))
+        log.debug("Pre-air: bulk-loaded %d/%d episode(s) from Sonarr.", len(found), len(missing))
+        return found
+
+    def _series(self, sid: int, series_cache: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+        if sid not in series_cache:
+            series_cache[sid] = self.flight.do(("series", sid), lambda: self.sonarr.series(sid) or {})
+        return series_cache[sid]
+
+    def _tvmaze_airtime(self, ep: Dict[str, Any], series_cache: Dict[int, Dict[str, Any]]) -> Tuple[bool, Optional[datetime.datetime]]:
+        """(applicable, airstamp); applicable=False means TVmaze has no opinion on this episode."""
+        sid = ep.get("seriesId")
+        if not sid:
+            return True, None
+        series = self._series(sid, series_cache)
+        tm_id = self.internet.tvmaze_show_id(series)
+        season = ep.get("seasonNumber"); number = ep.get("episodeNumber")
+        if tm_id and season is not None and number is not None:
+            return True, self.internet.tvmaze_episode_airstamp(tm_id, int(season), int(number))
+        return False, None
+
+    def _tvdb_airtime(self, ep: Dict[str, Any], series_cache: Dict[int, Dict[str, Any]]) -> Tuple[bool, Optional[datetime.datetime]]:
+        """(applicable, airstamp); applicable=False means TheTVDB has no opinion on this episode."""
+        sid = ep.get("seriesId")
+        if not sid:
+            return True, None
+        series = self._series(sid, series_cache)
+        tvdb_series_id = series.get("tvdbId")
+        season = ep.get("seasonNumber"); number = ep.get("episodeNumber")
+        if tvdb_series_id and season is not None and number is not None:
+            return True, self.internet.tvdb_episode_airstamp(int(tvdb_series_id), int(season), int(number))
+        return False, None
+
+    def _provider_airtime(self, provider: str, eid: int, ep: Dict[str, Any],
+                          series_cache: Dict[int, Dict[str, Any]]) -> Tuple[bool, Optional[datetime.datetime]]:
+        lookup = self._tvmaze_airtime if provider == "tvmaze" else self._tvdb_airtime
+        try:
+            return self._cached((provider, eid), lambda: lookup(ep, series_cache), lambda r: r[1])
+        except ProviderUnavailable as e:
+            # Unknown for this run only: a failed lookup is never cached as the provider's answer
+            metrics.inc(f"preair_provider_unavailable[{provider}]")
+            log.info("Pre-air: %s unavailable for episode %s (%s); treating as unknown.", provider, eid, e)
+            return True, None
+
+    def _cross_check(self, provider: str, episodes: Sequence[int], eps: Dict[int, Dict[str, Any]],
+                     series_cache: Dict[int, Dict[str, Any]]) -> List[float]:
+        """Hours-until-air per not-yet-aired episode according to an internet provider."""
+        inet_future: List[float] = []
+        for eid in episodes:
+            applicable, dt = self._provider_airtime(provider, eid, eps[eid], series_cache)
+            if not applicable:
+                continue
+            if dt is None:
+                inet_future.append(self.UNKNOWN_HOURS)
+            elif dt > now_utc():
+                inet_future.append(hours_until(dt))
+        return inet_future
 
     def decision(self, qbit: QbitClient, h: str, tracker_hosts: Set[str]) -> Tuple[bool, str, List[Dict[str, Any]]]:
         """
@@ -625,16 +1491,16 @@ class PreAirGate:
         'reason' is textual for logs; 'history_rows' used for potential blocklist if blocked.
         """
         # Give Sonarr a moment to write "Grabbed" history
-        time.sleep(0.8)
+        deadline_sleep(0.8)
 
         # Fetch history for this download
         hist = []
         for _ in range(5):
             hist = self.sonarr.history_for_download(h)
             if hist: break
-            time.sleep(0.8)
+            deadline_sleep(0.8)
 
-        episodes = {int(r["episodeId"]) for r in hist if r.get("episodeId")}
+        episodes = sorted({int(r["episodeId"]) for r in hist if r.get("episodeId")})
         rel_groups, indexers = set(), set()
         for r in hist:
             d = r.get("data") or {}
@@ -650,57 +1516,29 @@ class PreAirGate:
             return False, "no-history", hist
 
         # Load episodes and compute future hours from Sonarr
+        # Calendar index first, then one bulk call (season packs) for the rest
+        eps = {eid: ep for eid, ep in ((e, self.calendar.get(e)) for e in episodes) if ep} if self.calendar else {}
+        bulk = self._prefetch_episodes([eid for eid in episodes if eid not in eps])
+        for eid in episodes:
+            if eid not in eps:
+                eps[eid] = bulk.get(eid) or self._episode(eid)
         future_hours: List[float] = []
         series_cache: Dict[int, Dict[str, Any]] = {}
         for eid in episodes:
-            ep = self.sonarr.episode(eid) or {}
-            air = parse_iso_utc(ep.get("airDateUtc"))
+            air = parse_iso_utc(eps[eid].get("airDateUtc"))
             if air and air > now_utc():
                 future_hours.append(hours_until(air))
             elif air is None:
-                future_hours.append(99999.0)
+                future_hours.append(self.UNKNOWN_HOURS)
 
         all_aired = len(future_hours) == 0
         max_future = max(future_hours) if future_hours else 0.0
 
         # Internet cross-checks
-        if not all_aired and self.cfg.internet_check_provider in ("tvmaze","both"):
-            inet_future = []
-            for eid in episodes:
-                ep = self.sonarr.episode(eid) or {}
-                sid = ep.get("seriesId")
-                if not sid:
-                    inet_future.append(99999.0); continue
-                if sid not in series_cache:
-                    series_cache[sid] = self.sonarr.series(sid) or {}
-                series = series_cache[sid]
-                tm_id = self.internet.tvmaze_show_id(series)
-                season = ep.get("seasonNumber"); number = ep.get("episodeNumber")
-                if tm_id and season is not None and number is not None:
-                    dt = self.internet.tvmaze_episode_airstamp(tm_id, int(season), int(number))
-                    if dt and dt > now_utc(): inet_future.append(hours_until(dt))
-                    elif dt is None: inet_future.append(99999.0)
-            if inet_future:
-                m = max(inet_future)
-                max_future = min(max_future, m) if max_future else m
-                all_aired = False
-
-        if not all_aired and self.cfg.internet_check_provider in ("tvdb","both"):
-            inet_future = []
-            for eid in episodes:
-                ep = self.sonarr.episode(eid) or {}
-                sid = ep.get("seriesId")
-                if not sid:
-                    inet_future.append(99999.0); continue
-                if sid not in series_cache:
-                    series_cache[sid] = self.sonarr.series(sid) or {}
-                series = series_cache[sid]
-                tvdb_series_id = series.get("tvdbId")
-                season = ep.get("seasonNumber"); number = ep.get("episodeNumber")
-                if tvdb_series_id and season is not None and number is not None:
-                    dt = self.internet.tvdb_episode_airstamp(int(tvdb_series_id), int(season), int(number))
-                    if dt and dt > now_utc(): inet_future.append(hours_until(dt))
-                    elif dt is None: inet_future.append(99999.0)
+        for provider in ("tvmaze", "tvdb"):
+            if all_aired or self.cfg.internet_check_provider not in (provider, "both"):
+                continue
+            inet_future = self._cross_check(provider, episodes, eps, series_cache)
             if inet_future:
                 m = max(inet_future)
                 max_future = min(max_future, m) if max_future else m
@@ -728,11 +1566,113 @@ class PreAirGate:
 
 # --------------------------- Metadata Fetcher ---------------------------
 
+def _file_index(f: Dict[str, Any], pos: int) -> int:
+    """qB reports 'index' per file (API 2.8.2+); older versions use list position."""
+    return int(f.get("index", pos))
+
+
 class MetadataFetcher:
-    """Starts torrent and waits until metadata (file list) is available, then stops again."""
+    """
+    Starts torrent and waits until metadata (file list) is available, then stops again.
+    With METADATA_ZERO_PAYLOAD, all files are set to priority 0 as soon as the list appears,
+    so no payload is fetched before the stop lands; restore() puts the original priorities back.
+    Held priorities are persisted under METADATA_HELD_DIR so they survive a restart before restore().
+    """
     def __init__(self, cfg: Config, qbit: QbitClient):
         self.cfg = cfg
         self.qbit = qbit
+        self._held: Dict[str, Dict[int, int]] = {}  # hash -> {file index: original priority}
+        self._held_lock = threading.Lock()
+
+    def _held_path(self, torrent_hash: str) -> str:
+        """<METADATA_HELD_DIR>/<qB host:port>/<hash>.json: instances sharing /config don't see each other's holds."""
+        if not self.cfg.metadata_held_dir:
+            return ""
+        instance = re.sub(r"[^A-Za-z0-9._-]+", "_", uparse.urlsplit(self.cfg.qbit_host).netloc or self.cfg.qbit_host)
+        return os.path.join(self.cfg.metadata_held_dir, instance, torrent_hash.lower() + ".json")
+
+    def _save_held(self, torrent_hash: str, original: Dict[int, int]) -> None:
+        path = self._held_path(torrent_hash)
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(original, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            log.warning("Metadata: could not persist held priorities for %s: %s", torrent_hash, e)
+
+    def _load_held(self, torrent_hash: str) -> Optional[Dict[int, int]]:
+        path = self._held_path(torrent_hash)
+        if not path:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return {int(k): int(v) for k, v in json.load(f).items()}
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, AttributeError) as e:
+            log.warning("Metadata: unreadable held priorities %s: %s", path, e)
+            return None
+
+    def _drop_held(self, torrent_hash: str) -> None:
+        path = self._held_path(torrent_hash)
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning("Metadata: could not remove %s: %s", path, e)
+
+    def _hold_payload(self, torrent_hash: str, files: Sequence[Dict[str, Any]]) -> int:
+        """Zero all file priorities; returns payload bytes held back."""
+        original = {_file_index(f, i): int(f.get("priority", 1)) for i, f in enumerate(files)}
+        self._save_held(torrent_hash, original)  # before zeroing: a crash in between must not lose them
+        try:
+            self.qbit.set_file_priority(torrent_hash, sorted(original), 0)
+        except Exception as e:
+            log.warning("Metadata: could not zero file priorities for %s: %s", torrent_hash, e)
+            self._drop_held(torrent_hash)
+            return 0
+        with self._held_lock:
+            self._held[torrent_hash] = original
+        return int(sum(int(f.get("size", 0)) * (1.0 - float(f.get("progress") or 0)) for f in files))
+
+    def restore(self, torrent_hash: str, exclude: Sequence[int] = ()) -> None:
+        """
+        Put back the priorities saved by a zero-payload fetch (one filePrio call per distinct priority).
+        Indices in `exclude` (deselected by the selective extension policy) stay at 0.
+        Falls back to the copy under METADATA_HELD_DIR (hold made before a restart); a torrent with no
+        record was never held by this guard and is left alone.
+        """
+        with self._held_lock:
+            original = self._held.pop(torrent_hash, None)
+        if original is None:
+            original = self._load_held(torrent_hash)
+        if not original:
+            return
+        skip = set(exclude)
+        by_prio: Dict[int, List[int]] = {}
+        for idx, prio in original.items():
+            if idx not in skip:
+                by_prio.setdefault(prio, []).append(idx)
+        for prio, ids in sorted(by_prio.items()):
+            if prio == 0:
+                continue  # already 0
+            try:
+                self.qbit.set_file_priority(torrent_hash, sorted(ids), prio)
+            except Exception as e:
+                log.error("Metadata: failed to restore file priorities for %s: %s", torrent_hash, e)
+                return  # keep the on-disk copy for the next attempt
+        self._drop_held(torrent_hash)
+
+    def discard(self, torrent_hash: str) -> None:
+        """Forget held priorities (torrent is being deleted)."""
+        with self._held_lock:
+            self._held.pop(torrent_hash, None)
+        self._drop_held(torrent_hash)
 
     def fetch(self, torrent_hash: str) -> List[Dict[str, Any]]:
         """
@@ -741,10 +1681,13 @@ class MetadataFetcher:
         Optional: max wait and download budget guards.
         """
         # If already present, don't start it.
-        files = self.qbit.files(torrent_hash) or []
+        files = self.qbit.files(torrent_hash)
         if files:
             return files
 
+        pre = self.qbit.info(torrent_hash) or {}
+        pre_downloaded = int(pre.get("downloaded") or 0)
+        held_bytes = 0
         self.qbit.start(torrent_hash)
         start_ts = time.time()
         ticks = 0
@@ -758,6 +1701,8 @@ class MetadataFetcher:
 
                 files = self.qbit.files(torrent_hash) or []
                 if files:
+                    if self.cfg.metadata_zero_payload:
+                        held_bytes = self._hold_payload(torrent_hash, files)
                     break
 
                 # State / downloaded budget guard
@@ -778,17 +1723,44 @@ class MetadataFetcher:
                 if self.cfg.metadata_max_wait_sec > 0 and (time.time() - start_ts) >= self.cfg.metadata_max_wait_sec:
                     break
 
-                time.sleep(self.cfg.metadata_poll_interval)
+                deadline_sleep(self.cfg.metadata_poll_interval)
                 ticks += 1
         finally:
-            # Stop asap after metadata obtained (or on abort)
-            self.qbit.stop(torrent_hash)
+            # Stop asap after metadata obtained (or on abort); this must land even past the deadline
+            with deadline(None):
+                self.qbit.stop(torrent_hash)
 
+        if files:
+            post = self.qbit.info(torrent_hash) or {}
+            payload = max(0, int(post.get("downloaded") or 0) - pre_downloaded)
+            metrics.inc("metadata_payload_bytes", payload)
+            metrics.inc("metadata_held_bytes", held_bytes)
+            log.info("Metadata: resolved in %.1fs | payload downloaded during wait=%d B | held back at priority 0=%d B",
+                     time.time() - start_ts, payload, held_bytes)
         return files or []
 
 
 # --------------------------- ISO + Extension Policy Cleaner ---------------------------
 
+@dataclass
+class PolicyVerdict:
+    """Outcome of the extension/ISO policy for one file list."""
+    action: str                       # "keep" | "delete"
+    reason: str                       # "ok" | "ext" | "iso" | "name"
+    files: int                        # non-empty files considered
+    disallowed: List[Dict[str, Any]]  # files rejected by the extension policy
+    keepable: bool                    # has a keepable video file
+    deselect: List[int] = None        # file indices to set to priority 0 (selective mode)
+
+    def __post_init__(self):
+        if self.deselect is None:
+            self.deselect = []
+
+    @property
+    def delete(self) -> bool:
+        return self.action == "delete"
+
+
 class IsoCleaner:
     """
     Detects ISO/BDMV-only torrents and applies extension policy.
@@ -798,11 +1770,13 @@ class IsoCleaner:
     """
     VIDEO_RE = re.compile(r'\.(mkv|mp4|m4v|avi|ts|m2ts|mov|webm)$', re.I)
 
-    def __init__(self, cfg: Config, qbit: QbitClient, sonarr: SonarrClient, radarr: RadarrClient):
+    def __init__(self, cfg: Config, qbit: QbitClient, sonarr: SonarrClient, radarr: RadarrClient,
+                 router: Optional[ArrRouter] = None):
         self.cfg = cfg
         self.qbit = qbit
         self.sonarr = sonarr
         self.radarr = radarr
+        self.router = router
         self.min_bytes = int(cfg.min_keepable_video_mb * 1024 * 1024)
 
         # Build disc-image regex from a single source of truth
@@ -822,6 +1796,11 @@ class IsoCleaner:
         return False
 
     def _blocklist_arr_if_applicable(self, category_norm: str, torrent_hash: str) -> None:
+        if self.router:
+            for client in self.router.clients_for(category_norm):
+                try: client.blocklist_download(torrent_hash)
+                except Exception as e: log.error("%s blocklist error: %s", client.name, e)
+            return
         if category_norm in self.cfg.sonarr_categories and self.sonarr.enabled:
             try: self.sonarr.blocklist_download(torrent_hash)
             except Exception as e: log.error("Sonarr blocklist error: %s", e)
@@ -829,40 +1808,67 @@ class IsoCleaner:
             try: self.radarr.blocklist_download(torrent_hash)
             except Exception as e: log.error("Radarr blocklist error: %s", e)
 
-    def evaluate_and_act(self, torrent_hash: str, category_norm: str) -> bool:
-        """
-        Returns True if it deleted the torrent (ISO/BDMV-only or extension-policy violation), False otherwise.
-        Will notify Sonarr/Radarr before deletion based on category.
-        """
-        all_files = self.qbit.files(torrent_hash) or []
+    def evaluate(self, all_files: Sequence[Dict[str, Any]]) -> PolicyVerdict:
+        """Pure policy evaluation of a file list (no qB/Arr side effects)."""
         relevant = [f for f in all_files if int(f.get("size",0)) > 0]
 
         # ---- Extension policy analysis (before disc detection) ----
         disallowed = [f for f in relevant if not self.cfg.is_path_allowed(f.get("name",""))]
+        deselect: List[int] = []
         if disallowed:
-            total = len(relevant)
-            bad = len(disallowed)
-            sample = (disallowed[0].get("name","") if disallowed else "")
-            log.info("Ext policy: %d/%d file(s) disallowed. e.g., %s", bad, total, sample)
-            if self.cfg.ext_delete_if_any_blocked or (self.cfg.ext_delete_if_all_blocked and bad == total):
-                # Delete due to extension policy
-                self.qbit.add_tags(torrent_hash, self.cfg.ext_violation_tag)
-                self._blocklist_arr_if_applicable(category_norm, torrent_hash)
-                if not self.cfg.dry_run:
-                    try:
-                        self.qbit.delete(torrent_hash, self.cfg.delete_files)
-                        log.info("Removed torrent %s due to extension policy.", torrent_hash)
-                    except Exception as e:
-                        log.error("qB delete failed: %s", e)
-                else:
-                    log.info("DRY-RUN: would remove torrent %s due to extension policy.", torrent_hash)
-                return True
+            bad, total = len(disallowed), len(relevant)
+            if self.cfg.ext_selective and bad < total:
+                deselect = [_file_index(f, i) for i, f in enumerate(all_files)
+                            if int(f.get("size",0)) > 0 and not self.cfg.is_path_allowed(f.get("name",""))]
+            elif self.cfg.ext_delete_if_any_blocked or (self.cfg.ext_delete_if_all_blocked and bad == total):
+                return PolicyVerdict("delete", "ext", total, disallowed, False)
+
+        # ---- Disc-image detection (ISO/BDMV), on what will actually download ----
+        skip = set(deselect)
+        kept = [f for i, f in enumerate(all_files) if int(f.get("size",0)) > 0 and _file_index(f, i) not in skip]
+        all_discish = (len(kept) > 0) and all(self._is_disc_path(f.get("name","")) for f in kept)
+        keepable = self.has_keepable_video(kept)
+        if all_discish and not keepable:
+            return PolicyVerdict("delete", "iso", len(relevant), disallowed, keepable)
+        if deselect and not keepable:
+            # selective mode would leave only extras (subs, nfo, samples): nothing worth importing
+            return PolicyVerdict("delete", "ext", len(relevant), disallowed, keepable)
+        return PolicyVerdict("keep", "ok", len(relevant), disallowed, keepable, deselect)
+
+    def act(self, torrent_hash: str, category_norm: str, verdict: PolicyVerdict) -> bool:
+        """Log the verdict and delete (with Arr blocklist) if required. Returns True if deleted."""
+        if verdict.disallowed:
+            log.info("Ext policy: %d/%d file(s) disallowed. e.g., %s",
+                     len(verdict.disallowed), verdict.files, verdict.disallowed[0].get("name",""))
+
+        if verdict.reason == "ext":
+            # Delete due to extension policy
+            self.qbit.add_tags(torrent_hash, self.cfg.ext_violation_tag)
+            self._blocklist_arr_if_applicable(category_norm, torrent_hash)
+            if not self.cfg.dry_run:
+                try:
+                    self.qbit.delete(torrent_hash, self.cfg.delete_files)
+                    log.info("Removed torrent %s due to extension policy.", torrent_hash)
+                except Exception as e:
+                    log.error("qB delete failed: %s", e)
+            else:
+                log.info("DRY-RUN: would remove torrent %s due to extension policy.", torrent_hash)
+            return True
 
-        # ---- Disc-image detection (ISO/BDMV) ----
-        all_discish = (len(relevant) > 0) and all(self._is_disc_path(f.get("name","")) for f in relevant)
-        keepable = self.has_keepable_video(relevant)
+        if verdict.reason == "name":
+            self.qbit.add_tags(torrent_hash, "trash:name")
+            self._blocklist_arr_if_applicable(category_norm, torrent_hash)
+            if not self.cfg.dry_run:
+                try:
+                    self.qbit.delete(torrent_hash, self.cfg.delete_files)
+                    log.info("Removed torrent %s (name prefilter).", torrent_hash)
+                except Exception as e:
+                    log.error("qB delete failed: %s", e)
+            else:
+                log.info("DRY-RUN: would remove torrent %s (name prefilter).", torrent_hash)
+            return True
 
-        if all_discish and not keepable:
+        if verdict.reason == "iso":
             log.info("ISO cleaner: disc-image content detected (no keepable video).")
             self.qbit.add_tags(torrent_hash, "trash:iso")
             self._blocklist_arr_if_applicable(category_norm, torrent_hash)
@@ -876,74 +1882,559 @@ class IsoCleaner:
                 log.info("DRY-RUN: would remove torrent %s (ISO/BDMV-only).", torrent_hash)
             return True
 
+        if verdict.deselect:
+            skipped = sum(int(f.get("size",0)) for f in verdict.disallowed)
+            if not self.cfg.dry_run:
+                try:
+                    self.qbit.set_file_priority(torrent_hash, verdict.deselect, 0)
+                    metrics.inc("ext_selective_skipped_bytes", skipped)
+                    log.info("Ext policy (selective): skipping %d disallowed file(s), %d B, in %s.",
+                             len(verdict.deselect), skipped, torrent_hash)
+                except Exception as e:
+                    log.error("qB filePrio failed for %s: %s", torrent_hash, e)
+            else:
+                log.info("DRY-RUN: would skip %d disallowed file(s), %d B, in %s.", len(verdict.deselect), skipped, torrent_hash)
+
         log.info("ISO/Ext check: keepable=%s, files=%d (disallowed=%d).",
-                 keepable, len(relevant), len(disallowed))
+                 verdict.keepable, verdict.files, len(verdict.disallowed))
         return False
 
+    def evaluate_and_act(self, torrent_hash: str, category_norm: str) -> bool:
+        """
+        Returns True if it deleted the torrent (ISO/BDMV-only or extension-policy violation), False otherwise.
+        Will notify Sonarr/Radarr before deletion based on category.
+        """
+        all_files = self.qbit.files(torrent_hash) or []
+        return self.act(torrent_hash, category_norm, self.evaluate(all_files))
+
+
+# --------------------------- File-list cache ---------------------------
+
+class FileListCache:
+    """
+    Persistent infohash -> (file list, policy verdict) store. A torrent's file list never changes for
+    a given infohash, so removed-and-re-added torrents skip the metadata wait entirely. The verdict is
+    stored with the policy fingerprint it was computed under and recomputed when the policy changes.
+    Bounded to `max_entries` rows (least recently used evicted).
+    """
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=15.0, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS files (hash TEXT PRIMARY KEY, files TEXT NOT NULL, "
+                        "policy TEXT NOT NULL, verdict TEXT NOT NULL, used REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS files_used ON files (used)")
+
+    @classmethod
+    def from_config(cls, cfg: Config) -> Optional["FileListCache"]:
+        if not cfg.file_cache_db or cfg.file_cache_max <= 0:
+            return None
+        try:
+            return cls(cfg.file_cache_db, cfg.file_cache_max)
+        except Exception as e:
+            log.warning("File-list cache %s unavailable (%s); continuing without it.", cfg.file_cache_db, e)
+            return None
+
+    @staticmethod
+    def _slim(files: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [{"index": _file_index(f, i), "name": f.get("name", ""), "size": int(f.get("size", 0))}
+                for i, f in enumerate(files)]
+
+    def get(self, torrent_hash: str) -> Optional[Tuple[List[Dict[str, Any]], str, PolicyVerdict]]:
+        try:
+            with self._lock:
+                row = self.db.execute("SELECT files, policy, verdict FROM files WHERE hash = ?",
+                                      (torrent_hash.lower(),)).fetchone()
+                if row:
+                    self.db.execute("UPDATE files SET used = ? WHERE hash = ?", (time.time(), torrent_hash.lower()))
+        except sqlite3.Error as e:
+            log.warning("File-list cache read failed: %s", e)
+            return None
+        if not row:
+            metrics.inc("file_cache_misses")
+            return None
+        metrics.inc("file_cache_hits")
+        return json.loads(row[0]), row[1], PolicyVerdict(**json.loads(row[2]))
+
+    def put(self, torrent_hash: str, files: Sequence[Dict[str, Any]], policy: str, verdict: PolicyVerdict) -> None:
+        v = asdict(verdict)
+        v["disallowed"] = self._slim(verdict.disallowed)
+        try:
+            with self._lock:
+                self.db.execute("INSERT OR REPLACE INTO files (hash, files, policy, verdict, used) VALUES (?, ?, ?, ?, ?)",
+                                (torrent_hash.lower(), json.dumps(self._slim(files)), policy, json.dumps(v), time.time()))
+                excess = self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    self.db.execute("DELETE FROM files WHERE hash IN (SELECT hash FROM files ORDER BY used LIMIT ?)", (excess,))
+        except sqlite3.Error as e:
+            log.warning("File-list cache write failed: %s", e)
+
+
+# --------------------------- Name prefilter ---------------------------
+
+class NamePrefilter:
+    """
+    Compiled reject/allow regexes matched against the torrent name. Reject wins over allow.
+    Every hit is counted per pattern (logs + metrics) so patterns can be tuned.
+    """
+    def __init__(self, cfg: Config):
+        self.enabled = cfg.name_prefilter
+        self.reject = self._compile(cfg.name_reject_patterns, "GUARD_NAME_REJECT")
+        self.allow = self._compile(cfg.name_allow_patterns, "GUARD_NAME_ALLOW")
+
+    @staticmethod
+    def _compile(spec: str, what: str) -> List[Tuple[str, re.Pattern]]:
+        out = []
+        for pat in (p.strip() for p in (spec or "").split(";")):
+            if not pat:
+                continue
+            try:
+                out.append((pat, re.compile(pat, re.I)))
+            except re.error as e:
+                log.warning("%s: invalid pattern %r ignored (%s)", what, pat, e)
+        return out
+
+    def _hit(self, kind: str, pat: str, name: str) -> None:
+        metrics.inc(f"name_prefilter_{kind}")
+        metrics.inc(f"name_prefilter_hit:{pat}")
+        log.info("Name prefilter: %s | pattern=%r (hits=%d) | name='%s'",
+                 kind, pat, metrics.snapshot().get(f"name_prefilter_hit:{pat}", 0), name)
+
+    def match(self, name: str) -> Optional[str]:
+        """Returns "reject", "allow" or None."""
+        if not self.enabled or not name:
+            return None
+        for kind, patterns in (("reject", self.reject), ("allow", self.allow)):
+            for pat, rx in patterns:
+                if rx.search(name):
+                    self._hit(kind, pat, name)
+                    return kind
+        return None
+
+
+# --------------------------- Learned rejection terms ---------------------------
+
+class TermLearner:
+    """
+    Learns release groups behind ISO/ext deletions, per Arr instance. A group rejected in
+    >= GUARD_LEARN_THRESHOLD distinct releases and never seen in an allowed release becomes a
+    "must not contain" term (as a /-group\b/i regex) in one managed release profile per instance,
+    pushed in batches at most every GUARD_LEARN_SYNC_SEC. State persists in GUARD_LEARN_STATE_FILE.
+    Only the group is learned: title and quality words would block the very releases that clear them.
+    """
+    STATE_VERSION = 2
+    # "Show.S01E02.1080p.WEB-DL.x264-GRP[rarbg].mkv" -> "GRP"
+    GROUP_RE = re.compile(r"-([A-Za-z0-9]{2,32})$")
+    TAIL_RE = re.compile(r"(\.(mkv|mp4|avi|m4v|ts|iso|torrent)|\s*[\[(][^\])]*[\])])*\s*$", re.I)
+    # What a trailing "-X" looks like when a release has no group ("WEB-DL", "x264-DTS", ...)
+    NOT_GROUP = {"dl", "rip", "web", "webdl", "webrip", "hdtv", "bluray", "remux", "dts", "ac3", "aac", "atmos",
+                 "x264", "x265", "h264", "h265", "hevc", "avc", "10bit", "hdr", "dv", "multi", "proper", "repack"}
+    MAX_RELEASES = 50  # release names kept per rejected group (distinct-release counting only needs the threshold)
+
+    def __init__(self, cfg: Config):
+        self.cfg = cfg
+        self.path = cfg.learn_state_file
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        self._dirty = False
+        self.state: Dict[str, Any] = {"version": self.STATE_VERSION, "instances": {}}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                loaded = json.load(f) or {}
+            if loaded.get("version") == self.STATE_VERSION:
+                self.state = loaded
+                self.state.setdefault("instances", {})
+            else:
+                log.info("Learned terms: state %s is from an older format; starting fresh.", self.path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning("Learned terms: unreadable state %s (%s); starting fresh.", self.path, e)
+
+    @classmethod
+    def release_group(cls, name: str, history_rows: Sequence[Dict[str, Any]] = ()) -> str:
+        """Group from Arr history (data.releaseGroup) when known, else the trailing -GROUP of the name."""
+        for r in history_rows or ():
+            g = str((r.get("data") or {}).get("releaseGroup") or "").strip().lower()
+            if g and g not in cls.NOT_GROUP:
+                return g
+        m = cls.GROUP_RE.search(cls.TAIL_RE.sub("", (name or "").strip()))
+        g = m.group(1).lower() if m else ""
+        return "" if g in cls.NOT_GROUP or g.isdigit() else g
+
+    def _bucket(self, instance: str) -> Dict[str, Any]:
+        b = self.state["instances"].setdefault(instance, {})
+        b.setdefault("rejected", {})  # group -> distinct release names
+        b.setdefault("allowed", {})   # group -> count; never pruned, it is what vetoes a term
+        b.setdefault("synced", [])
+        return b
+
+    def record(self, router: ArrRouter, category_norm: str, name: str, rejected: bool,
+               history_rows: Sequence[Dict[str, Any]] = ()) -> None:
+        group = self.release_group(name, history_rows)
+        if not group:
+            return
+        release = (name or "").strip().lower()
+        with self._lock:
+            for client in router.clients_for(category_norm):
+                b = self._bucket(client.name)
+                if not rejected:
+                    b["allowed"][group] = b["allowed"].get(group, 0) + 1
+                    continue
+                releases = b["rejected"].setdefault(group, [])
+                if release not in releases:
+                    releases.append(release)
+                    del releases[:-self.MAX_RELEASES]
+            self._dirty = True
+
+    def terms(self, instance: str) -> List[str]:
+        b = self._bucket(instance)
+        allowed = b["allowed"]
+        hot = [(len(r), g) for g, r in b["rejected"].items() if len(r) >= self.cfg.learn_threshold and g not in allowed]
+        return sorted(g for _, g in sorted(hot, reverse=True)[:max(0, self.cfg.learn_max_terms)])
+
+    def _save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def _sync_instance(self, client: BaseArr, terms: List[str], profile_id: Optional[int]) -> Optional[int]:
+        """Write `terms` to the instance's release profile; returns its id. Runs without the lock held."""
+        patterns = [f"/-{re.escape(t)}\\b/i" for t in terms]
+        if self.cfg.dry_run:
+            log.info("DRY-RUN: would sync %d learned term(s) to %s: %s", len(terms), client.name, ", ".join(terms[:20]))
+            return profile_id
+        profiles = client.release_profiles()
+        profile = next((p for p in profiles if profile_id and p.get("id") == profile_id), None) \
+            or next((p for p in profiles if p.get("name") == self.cfg.learn_profile_name), None)
+        if profile is None:
+            profile = {"name": self.cfg.learn_profile_name, "enabled": True, "required": [], "indexerId": 0, "tags": []}
+        # Sonarr v3 uses comma-joined strings, v4/Radarr v5 use lists
+        profile["ignored"] = ",".join(patterns) if isinstance(profile.get("ignored"), str) else patterns
+        try:
+            saved = client.save_release_profile(profile)
+        except uerr.HTTPError as e:
+            if e.code != 400 or not isinstance(profile["ignored"], list):
+                raise
+            profile["ignored"] = ",".join(patterns)
+            saved = client.save_release_profile(profile)
+        metrics.inc("learned_terms_synced", len(terms))
+        log.info("Learned terms: synced %d term(s) to %s release profile '%s'.",
+                 len(terms), client.name, self.cfg.learn_profile_name)
+        return saved.get("id") or profile.get("id")
+
+    def maybe_sync(self, router: ArrRouter, force: bool = False) -> None:
+        """Push changed term sets (batched; at most once per GUARD_LEARN_SYNC_SEC) and persist state."""
+        # snapshot under the lock, talk to the *arrs without it (so record() never waits on HTTP),
+        # then commit what actually landed
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._last_sync < self.cfg.learn_sync_interval_sec):
+                return
+            self._dirty = False
+            self._last_sync = time.monotonic()
+            pending = []
+            for inst in router.instances:
+                if not inst.client.enabled:
+                    continue
+                b = self._bucket(inst.client.name)
+                terms = self.terms(inst.client.name)
+                if terms != b["synced"]:
+                    pending.append((inst.client, terms, b.get("profile_id")))
+        done = []
+        failed = False
+        for client, terms, profile_id in pending:
+            try:
+                done.append((client.name, terms, self._sync_instance(client, terms, profile_id)))
+            except Exception as e:
+                failed = True
+                log.warning("Learned terms: sync to %s failed: %s", client.name, e)
+        with self._lock:
+            for name, terms, profile_id in done:
+                b = self._bucket(name)
+                b["synced"] = terms
+                if profile_id:
+                    b["profile_id"] = profile_id
+            if failed:
+                self._dirty = True  # retry next window
+            try:
+                self._save()
+            except OSError as e:
+                log.warning("Learned terms: could not save %s: %s", self.path, e)
+
 
 # --------------------------- Orchestrator ---------------------------
 
+class ConfigReloader:
+    """
+    mtime-polls GUARD_EXTS_FILE and GUARD_CONFIG_FILE. poll() returns a freshly built Config
+    when either changed; callers swap it in between runs (in-flight runs keep the old one).
+    """
+    def __init__(self, cfg: Config):
+        self.cfg = cfg
+        self.interval = cfg.reload_interval_sec
+        self._last_check = time.monotonic()
+        self._mtimes = self._stat()
+
+    def _stat(self) -> Tuple[Optional[float], ...]:
+        out = []
+        for path in (self.cfg.exts_file, self.cfg.config_file):
+            try:
+                out.append(os.path.getmtime(path) if path else None)
+            except OSError:
+                out.append(None)
+        return tuple(out)
+
+    def poll(self) -> Optional[Config]:
+        if self.interval <= 0 or (time.monotonic() - self._last_check) < self.interval:
+            return None
+        self._last_check = time.monotonic()
+        mtimes = self._stat()
+        if mtimes == self._mtimes:
+            return None
+        self._mtimes = mtimes
+        log.info("Config change detected (%s / %s); reloading.", self.cfg.exts_file, self.cfg.config_file or "-")
+        try:
+            new_cfg = Config()
+        except Exception as e:
+            log.error("Config reload failed; keeping previous config: %s", e)
+            return None
+        self.cfg = new_cfg
+        metrics.inc("config_reloads")
+        return new_cfg
+
+
 class TorrentGuard:
     """Main orchestrator that wires qB, Sonarr/Radarr, pre-air, metadata, and ISO/Extension cleaner together."""
-    def __init__(self, cfg: Config):
+    def __init__(self, cfg: Config, shared: Optional["TorrentGuard"] = None, qbit_http: Optional[HttpClient] = None):
+        """
+        `shared`: another guard whose Arr/provider HTTP client and caches are reused (hot reload,
+        multiple qB instances). `qbit_http`: dedicated client (own session cookie) for this qB.
+        """
         self.cfg = cfg
-        self.http = HttpClient(cfg.ignore_tls, cfg.user_agent)
-        self.qbit = QbitClient(cfg, self.http)
-        self.sonarr = SonarrClient(cfg, self.http)
-        self.radarr = RadarrClient(cfg, self.http)
+        self.http = shared.http if shared else HttpClient.from_config(cfg)
+        # qB gets no circuit breaker: a swallowed CircuitOpenError on start/stop/tag would strand torrents
+        self.qbit_http = qbit_http or (shared.qbit_http if shared else HttpClient.from_config(cfg, breakers=False))
+        self.qbit = QbitClient(cfg, self.qbit_http)
+        self.router = ArrRouter.from_config(cfg, self.http, shared.router if shared else None)
+        self.sonarr = self.router.first("sonarr") or SonarrClient(cfg, self.http, url="")
+        self.radarr = self.router.first("radarr") or RadarrClient(cfg, self.http, url="")
         self.internet = InternetDates(cfg, self.http, self.sonarr)
-        self.preair = PreAirGate(cfg, self.sonarr, self.internet)
+        if shared and not cfg.tvdb_bearer:
+            self.internet._tvdb_token = shared.internet._tvdb_token
+        # One pre-air gate per Sonarr instance (episode ids are per instance, so caches are too)
+        self.gates: Dict[str, PreAirGate] = {}
+        for inst in self.router.of_kind("sonarr"):
+            prev = shared.gates.get(inst.name) if shared and shared.router is self.router else None
+            # Cached air-time expiries are derived from the grace window; only reuse them if it's unchanged
+            cache = prev.cache if prev and shared.cfg.early_grace_hours == cfg.early_grace_hours else None
+            # The calendar's fetch window/interval come from its Config; rebuild it when they change
+            # (start_background() stops the one it replaces)
+            same_window = prev and all(getattr(shared.cfg, k) == getattr(cfg, k) for k in CalendarIndex.CONFIG_KEYS)
+            if not (cfg.enable_preair and inst.client.enabled):
+                calendar = None
+            elif same_window and prev.calendar:
+                calendar = prev.calendar
+            else:
+                calendar = CalendarIndex(cfg, inst.client)
+            self.gates[inst.name] = PreAirGate(cfg, inst.client, self.internet, cache, prev.flight if prev else None,
+                                               calendar, inst.categories)
         self.metadata = MetadataFetcher(cfg, self.qbit)
-        self.iso = IsoCleaner(cfg, self.qbit, self.sonarr, self.radarr)
+        self.iso = IsoCleaner(cfg, self.qbit, self.sonarr, self.radarr, self.router)
+        self.prefilter = NamePrefilter(cfg)
+        if not cfg.learn_terms:
+            self.learner = None
+        elif shared and shared.learner and shared.learner.path == cfg.learn_state_file:
+            self.learner = shared.learner
+            self.learner.cfg = cfg
+        else:
+            self.learner = TermLearner(cfg)
+        if shared and shared.file_cache and shared.cfg.file_cache_db == cfg.file_cache_db:
+            self.file_cache = shared.file_cache
+            self.file_cache.max_entries = max(1, cfg.file_cache_max)
+        else:
+            self.file_cache = FileListCache.from_config(cfg)
+
+    def start_background(self, previous: Optional["TorrentGuard"] = None) -> None:
+        """
+        Long-running modes only: start background refreshers (pre-air calendar prefetch).
+        After a reload, pass the guard this one replaces: its refreshers that weren't carried over are stopped.
+        """
+        mine = {id(g.calendar) for g in self.gates.values() if g.calendar}
+        for gate in self.gates.values():
+            if gate.calendar:
+                gate.calendar.start()
+        if previous:
+            for gate in previous.gates.values():
+                if gate.calendar and id(gate.calendar) not in mine:
+                    gate.calendar.stop()
+
+    def gate_for(self, category_norm: str) -> Optional[PreAirGate]:
+        """Pre-air gate of the Sonarr instance that owns this category."""
+        for gate in self.gates.values():
+            if gate.should_apply(category_norm):
+                return gate
+        return None
+
+    def _cached_verdict(self, torrent_hash: str) -> Optional[PolicyVerdict]:
+        """Verdict for a previously seen infohash (recomputed from the stored file list if the policy changed)."""
+        hit = self.file_cache.get(torrent_hash) if self.file_cache else None
+        if not hit:
+            return None
+        files, policy, verdict = hit
+        fingerprint = self.cfg.policy_fingerprint()
+        if policy != fingerprint:
+            verdict = self.iso.evaluate(files)
+            self.file_cache.put(torrent_hash, files, fingerprint, verdict)
+        log.info("File-list cache hit for %s (%d file(s)); skipping metadata wait.", torrent_hash, len(files))
+        return verdict
 
     def run(self, torrent_hash: str, passed_category: str) -> None:
-        """Entry point for a single torrent hash."""
-        # Login qB
+        """
+        Entry point for a single torrent hash. Once the torrent is stopped, the decision is bounded by
+        GUARD_DECISION_DEADLINE_SEC; login/info/stop themselves run unbounded so a slow qB can't starve the stop.
+        """
+        state: Dict[str, Any] = {}
+        started = time.monotonic()
         try:
-            self.qbit.login()
-        except Exception as e:
-            log.error("qB login failed: %s", e)
-            sys.exit(2)
+            self._run(torrent_hash, passed_category, state)
+        except DeadlineExceeded as e:
+            self._on_deadline(torrent_hash, state, str(e))
+        finally:
+            if self.learner and state.get("outcome"):
+                try:
+                    self.learner.record(self.router, state["category"], state["name"], state["outcome"] == "rejected",
+                                        state.get("history") or ())
+                    self.learner.maybe_sync(self.router)
+                except Exception as e:
+                    log.warning("Learned terms: %s", e)
+            elapsed = time.monotonic() - started
+            metrics.inc("decision_runs")
+            metrics.inc("decision_seconds_total", round(elapsed, 3))
+            metrics.max("decision_seconds_max", round(elapsed, 3))
+
+    def _on_deadline(self, torrent_hash: str, state: Dict[str, Any], why: str) -> None:
+        """Fallback once the decision deadline expires (GUARD_DEADLINE_ACTION); runs without a deadline."""
+        metrics.inc("deadline_expired")
+        action = self.cfg.deadline_action if self.cfg.deadline_action in ("allow", "stop", "delete") else "stop"
+        log.warning("Deadline: %s for %s after %.0fs; action=%s.", why, torrent_hash, self.cfg.decision_deadline_sec, action)
+        if not state.get("stopped"):
+            return  # expired before the torrent was touched
+        metrics.inc(f"deadline_action[{action}]")
+        with deadline(None):
+            self.qbit.add_tags(torrent_hash, "guard:deadline")
+            if action == "delete":
+                self.metadata.discard(torrent_hash)
+                self.qbit.add_tags(torrent_hash, "trash:deadline")
+                if self.cfg.dry_run:
+                    log.info("DRY-RUN: would delete torrent %s (deadline).", torrent_hash)
+                    return
+                try:
+                    self.qbit.delete(torrent_hash, self.cfg.delete_files)
+                    log.info("Deadline: deleted torrent %s.", torrent_hash)
+                except Exception as e:
+                    log.error("qB delete failed: %s", e)
+                return
+            self.metadata.restore(torrent_hash)
+            if action == "allow":
+                self.qbit.add_tags(torrent_hash, "guard:allowed")
+                if not self.cfg.dry_run:
+                    self.qbit.start(torrent_hash)
+                log.info("Deadline: started torrent %s without a full decision.", torrent_hash)
+            else:
+                self.qbit.stop(torrent_hash)
+                log.info("Deadline: keeping torrent %s stopped for review.", torrent_hash)
 
-        info = self.qbit.info(torrent_hash)
-        if not info:
-            log.info("No torrent found for hash; exiting.")
-            return
+    def _run(self, torrent_hash: str, passed_category: str, state: Dict[str, Any]) -> None:
+        with deadline(None):
+            # Login qB
+            try:
+                self.qbit.login()
+            except Exception as e:
+                log.error("qB login failed: %s", e)
+                sys.exit(2)
 
-        category = (passed_category or info.get("category") or "").strip()
-        category_norm = category.lower()
-        name = info.get("name") or ""
-        log.info("Processing: hash=%s category='%s' name='%s'", torrent_hash, category, name)
+            info = self.qbit.info(torrent_hash)
+            if not info:
+                log.info("No torrent found for hash; exiting.")
+                return
 
-        if category_norm not in self.cfg.allowed_categories:
-            log.info("Category '%s' not in allowed list %s — skipping.", category, sorted(self.cfg.allowed_categories))
-            return
+            category = (passed_category or info.get("category") or "").strip()
+            category_norm = category.lower()
+            name = info.get("name") or ""
+            log.info("Processing: hash=%s category='%s' name='%s'", torrent_hash, category, name)
+
+            if category_norm not in self.cfg.allowed_categories:
+                log.info("Category '%s' not in allowed list %s — skipping.", category, sorted(self.cfg.allowed_categories))
+                return
+
+            # Stop immediately and tag
+            if not self.qbit.stop(torrent_hash):
+                raise RuntimeError(f"could not stop torrent {torrent_hash}; leaving it for a retry")
+            state.update(stopped=True, category=category_norm, name=name)
+            self.qbit.add_tags(torrent_hash, "guard:stopped")
 
-        # Stop immediately and tag
-        self.qbit.stop(torrent_hash)
-        self.qbit.add_tags(torrent_hash, "guard:stopped")
+        # The decision budget starts once the torrent can no longer download
+        budget = self.cfg.decision_deadline_sec
+        with deadline(budget if budget > 0 else None):
+            self._decide(torrent_hash, category, category_norm, name, state)
+
+    def _await_grab_history(self, torrent_hash: str, category_norm: str) -> None:
+        """
+        A name reject lands right after the stop, usually before Sonarr/Radarr have written the Grabbed
+        history row that blocklisting fails; poll for it the way PreAirGate.decision does.
+        """
+        if self.cfg.dry_run:
+            return
+        clients = self.router.clients_for(category_norm)
+        if not clients:
+            return
+        try:
+            for _ in range(5):
+                if any(c.history_for_download(torrent_hash) for c in clients):
+                    return
+                deadline_sleep(0.8)
+        except DeadlineExceeded:
+            pass  # still reject; blocklisting falls back to the queue
+        except Exception as e:
+            log.warning("History lookup before name reject failed: %s", e)
+
+    def _decide(self, torrent_hash: str, category: str, category_norm: str, name: str, state: Dict[str, Any]) -> None:
+        # 0) Name prefilter (no network work needed to decide)
+        name_hit = self.prefilter.match(name)
+        if name_hit == "reject":
+            self._await_grab_history(torrent_hash, category_norm)
+            with deadline(None):
+                self.iso.act(torrent_hash, category_norm, PolicyVerdict("delete", "name", 0, [], False))
+            return
 
         # Tracker hosts (for whitelist decisions)
         trackers = self.qbit.trackers(torrent_hash) or []
         tracker_hosts = {domain_from_url(t.get("url","")) for t in trackers if t.get("url")}
 
         # 1) PRE-AIR gate first
-        if self.preair.should_apply(category_norm):
-            allow, reason, history_rows = self.preair.decision(self.qbit, torrent_hash, tracker_hosts)
+        gate = self.gate_for(category_norm)
+        if gate:
+            allow, reason, history_rows = gate.decision(self.qbit, torrent_hash, tracker_hosts)
+            state["history"] = history_rows
+            deadline_check("pre-air")  # a verdict reached on timed-out lookups isn't trusted
             if not allow:
-                if not self.cfg.dry_run:
-                    try:
-                        self.sonarr.blocklist_download(torrent_hash)
-                    except Exception as e:
-                        log.error("Sonarr blocklist error: %s", e)
-                    self.qbit.add_tags(torrent_hash, "trash:preair")
-                    try:
-                        self.qbit.delete(torrent_hash, self.cfg.delete_files)
-                        log.info("Pre-air: deleted torrent %s (reason=%s).", torrent_hash, reason)
-                    except Exception as e:
-                        log.error("qB delete failed: %s", e)
-                else:
-                    log.info("DRY-RUN: would delete torrent %s due to pre-air (reason=%s).", torrent_hash, reason)
+                with deadline(None):
+                    if not self.cfg.dry_run:
+                        try:
+                            gate.sonarr.blocklist_download(torrent_hash)
+                        except Exception as e:
+                            log.error("%s blocklist error: %s", gate.sonarr.name, e)
+                        self.qbit.add_tags(torrent_hash, "trash:preair")
+                        try:
+                            self.qbit.delete(torrent_hash, self.cfg.delete_files)
+                            log.info("Pre-air: deleted torrent %s (reason=%s).", torrent_hash, reason)
+                        except Exception as e:
+                            log.error("qB delete failed: %s", e)
+                    else:
+                        log.info("DRY-RUN: would delete torrent %s due to pre-air (reason=%s).", torrent_hash, reason)
                 return
             else:
                 log.info("Pre-air passed (reason=%s). Proceeding to file/ISO/ext check.", reason)
@@ -951,35 +2442,217 @@ class TorrentGuard:
             log.info("Pre-air gate not applicable for category '%s' or Sonarr disabled.", category)
 
         # 2) Metadata + ISO/Extension policy cleaner
-        if self.cfg.enable_iso_check:
-            files = self.metadata.fetch(torrent_hash)
-            if not files:
-                log.warning("Metadata not available; skipping ISO/ext check.")
-            else:
-                deleted = self.iso.evaluate_and_act(torrent_hash, category_norm)
+        deselected: List[int] = []
+        if name_hit == "allow":
+            log.info("Name prefilter fast-track; skipping ISO/ext check.")
+        elif self.cfg.enable_iso_check:
+            verdict = self._cached_verdict(torrent_hash)
+            # Deselecting files needs qB to hold the metadata, so selective hits still go through the fetch
+            if verdict is None or verdict.deselect:
+                files = self.metadata.fetch(torrent_hash)
+                if not files:
+                    log.warning("Metadata not available; skipping ISO/ext check.")
+                    verdict = None
+                elif verdict is None:
+                    verdict = self.iso.evaluate(files)
+                    if self.file_cache and files:
+                        self.file_cache.put(torrent_hash, files, self.cfg.policy_fingerprint(), verdict)
+            deadline_check("metadata")
+            if verdict is not None:
+                with deadline(None):
+                    deleted = self.iso.act(torrent_hash, category_norm, verdict)
                 if deleted:
+                    self.metadata.discard(torrent_hash)
+                    if verdict.reason in ("iso", "ext"):
+                        state["outcome"] = "rejected"
                     return
+                deselected = verdict.deselect
 
-        # 3) Start for real
-        self.qbit.add_tags(torrent_hash, "guard:allowed")
-        if not self.cfg.dry_run:
-            self.qbit.start(torrent_hash)
+        # 3) Start for real (decision made; side effects are no longer bounded)
+        with deadline(None):
+            self.metadata.restore(torrent_hash, exclude=deselected)
+            self.qbit.add_tags(torrent_hash, "guard:allowed")
+            if not self.cfg.dry_run:
+                self.qbit.start(torrent_hash)
+        state["outcome"] = "allowed"
         log.info("Started torrent %s after checks.", torrent_hash)
 
 
+# --------------------------- Daemon ---------------------------
+
+SOCKET_PATH = os.getenv("GUARD_SOCKET", "/tmp/qbit-guard.sock")
+SOCKET_TIMEOUT_SEC = float(os.getenv("GUARD_SOCKET_TIMEOUT_SEC", "2"))
+SOCKET_MODE = int(os.getenv("GUARD_SOCKET_MODE", "660"), 8)
+DAEMON_WORKERS = max(1, int(os.getenv("GUARD_DAEMON_WORKERS", "2")))
+DAEMON_METRICS_LOG_SEC = float(os.getenv("GUARD_DAEMON_METRICS_LOG_SEC", "300"))
+
+
+def _socket_live(path: str) -> bool:
+    """True if something accepts connections on the socket; only a refused connect means it's stale."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(SOCKET_TIMEOUT_SEC)
+            sock.connect(path)
+        return True
+    except (ConnectionRefusedError, FileNotFoundError):
+        return False
+    except OSError:
+        return True  # e.g. timeout/permission: assume a live owner rather than steal its socket
+
+
+def handoff_to_daemon(torrent_hash: str, category: str, path: str = SOCKET_PATH) -> bool:
+    """Thin-client path: pass the hash to a running daemon. False if no daemon answered."""
+    if not path or not os.path.exists(path):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(SOCKET_TIMEOUT_SEC)
+            sock.connect(path)
+            sock.sendall(json.dumps({"hash": torrent_hash, "category": category}).encode() + b"\n")
+            reply = json.loads(sock.makefile("rb").readline() or b"{}")
+        if reply.get("ok"):
+            log.info("Handed %s to guard daemon (queue depth=%s).", torrent_hash, reply.get("depth"))
+            return True
+        log.warning("Guard daemon refused %s: %s", torrent_hash, reply.get("error"))
+    except (OSError, ValueError) as e:
+        log.warning("Guard daemon unavailable (%s); running in-process.", e)
+    return False
+
+
+class GuardDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix-socket server that queues hashes for a pool of workers sharing one warm TorrentGuard."""
+    daemon_threads = True
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            line = self.rfile.readline()
+            if not line:
+                return  # bare connect (liveness probe from a second daemon)
+            try:
+                req = json.loads(line)
+                h = str(req.get("hash") or "").strip().lower()
+                if not h:
+                    raise ValueError("missing hash")
+                depth = self.server.submit(h, str(req.get("category") or "").strip())
+                reply = {"ok": True, "depth": depth}
+            except Exception as e:
+                reply = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+    def __init__(self, cfg: Config, path: str = SOCKET_PATH, workers: int = DAEMON_WORKERS):
+        if os.path.exists(path):
+            if _socket_live(path):
+                raise RuntimeError(f"another guard daemon is already listening on {path}")
+            os.unlink(path)  # stale socket from a previous run
+        # Bind before building the guard: a daemon that can't bind must not start background refreshers
+        super().__init__(path, GuardDaemon.Handler)
+        self.path = path
+        try:
+            os.chmod(path, SOCKET_MODE)
+            self.guard = TorrentGuard(cfg)
+            self.guard.start_background()
+        except BaseException:
+            self.server_close()
+            raise
+        self.reloader = ConfigReloader(cfg)
+        self.jobs: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+        self._pending: Set[str] = set()   # queued
+        self._inflight: Set[str] = set()  # running on a worker
+        self._deferred: Dict[str, str] = {}  # resubmitted while running -> category; queued once the run ends
+        self._pending_lock = threading.Lock()
+        self._last_metrics_log = time.monotonic()
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"guard-daemon-{i}", daemon=True).start()
+        log.info("Guard daemon listening on %s (workers=%d).", path, workers)
+
+    def submit(self, h: str, category: str) -> int:
+        """Queue a hash; never twice, and never alongside its own run (a resubmit then runs once afterwards)."""
+        with self._pending_lock:
+            if h in self._inflight:
+                self._deferred[h] = category
+            elif h not in self._pending:
+                self._pending.add(h)
+                self.jobs.put((h, category))
+            metrics.set("daemon_queue_depth", self.jobs.qsize())
+            return self.jobs.qsize()
+
+    def _worker(self) -> None:
+        while True:
+            h, category = self.jobs.get()
+            with self._pending_lock:
+                self._pending.discard(h)
+                self._inflight.add(h)
+            guard = self.guard  # in-flight runs keep the guard they started with
+            try:
+                guard.run(h, category)
+            except BaseException as e:  # run() may sys.exit() on qB login failure
+                log.error("Guard run failed for %s: %s", h, e)
+            finally:
+                with self._pending_lock:
+                    self._inflight.discard(h)
+                    again = self._deferred.pop(h, None)
+                    if again is not None and h not in self._pending:
+                        self._pending.add(h)
+                        self.jobs.put((h, again))
+            metrics.inc("daemon_jobs_done")
+
+    def service_actions(self) -> None:
+        """Called by serve_forever between polls: hot reload and periodic metrics."""
+        new_cfg = self.reloader.poll()
+        if new_cfg is not None:
+            previous, self.guard = self.guard, TorrentGuard(new_cfg, shared=self.guard)
+            self.guard.start_background(previous)
+            log.info("Guard daemon reloaded; new runs use the updated config.")
+        if DAEMON_METRICS_LOG_SEC > 0 and (time.monotonic() - self._last_metrics_log) >= DAEMON_METRICS_LOG_SEC:
+            self._last_metrics_log = time.monotonic()
+            snap = metrics.format()
+            if snap:
+                log.info("Metrics | %s", snap)
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def run_daemon() -> None:
+    try:
+        server = GuardDaemon(Config())
+    except RuntimeError as e:
+        log.error("Guard daemon not started: %s", e)
+        sys.exit(2)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever(poll_interval=1.0)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        log.info("Guard daemon stopped.")
+
+
 # --------------------------- Main ---------------------------
 
 def main(argv: List[str]) -> None:
     """
     CLI entry point.
-    Usage: qbit-guard.py <INFO_HASH> [<CATEGORY>]
+    Usage: qbit-guard.py <INFO_HASH> [<CATEGORY>] | --daemon
     """
+    if len(argv) >= 2 and argv[1] == "--daemon":
+        run_daemon()
+        return
     if len(argv) < 2:
-        print("Usage: qbit-guard.py <INFO_HASH> [<CATEGORY>]")
+        print("Usage: qbit-guard.py <INFO_HASH> [<CATEGORY>] | --daemon")
         sys.exit(1)
     torrent_hash = argv[1].strip()
     passed_category = (argv[2] if len(argv) >= 3 else "").strip()
 
+    # Fast path: a warm daemon does the work; fall back to in-process execution
+    if handoff_to_daemon(torrent_hash, passed_category):
+        return
+
     cfg = Config()
     guard = TorrentGuard(cfg)
     try:
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+simulate.py — offline extension/ISO policy simulator
+
+Answers "how many torrents would flip verdict if I changed the policy?" without touching qB:
+- `dump` writes a snapshot of the library (torrent info + file lists) as JSONL, one torrent per line.
+  It only reads from qB (paged /torrents/info + parallel /torrents/files).
+- `run` evaluates IsoCleaner's policy logic over a snapshot under two configs (base and candidate)
+  in a multiprocessing pool and prints the verdict diff. Nothing is tagged, blocklisted or deleted.
+
+Configs are the usual env + GUARD_EXTS_FILE, plus an optional GUARD_CONFIG_FILE-style JSON of field
+overrides per side, e.g. {"ext_strategy": "allow", "allowed_exts": ["mkv", "srt"], "min_keepable_video_mb": 200}.
+
+Usage:
+  simulate.py dump [SNAPSHOT]                                  (default /config/snapshot.jsonl)
+  simulate.py run SNAPSHOT [--base BASE.json] [--candidate CANDIDATE.json]
+                           [--workers N] [--show N] [--diff-out FLIPS.jsonl]
+"""
+
+import os, sys, json, time, logging, argparse, multiprocessing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from guard import Config, HttpClient, QbitClient, IsoCleaner, PolicyVerdict
+from version import VERSION
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(
+    level=getattr(logging, LOG_LEVEL, logging.INFO),
+    format="%(asctime)s | %(levelname)s | %(message)s",
+    stream=sys.stdout,
+)
+log = logging.getLogger("qbit-guard-simulate")
+
+DEFAULT_SNAPSHOT = os.getenv("SIMULATE_SNAPSHOT_FILE", "/config/snapshot.jsonl")
+PAGE_SIZE = max(1, int(os.getenv("AUDIT_PAGE_SIZE", "200")))
+CONCURRENCY = max(1, int(os.getenv("AUDIT_CONCURRENCY", "8")))
+BATCH_LINES = 2000  # snapshot lines per pool task
+
+
+# --------------------------- dump ---------------------------
+
+def dump(cfg: Config, path: str) -> None:
+    http = HttpClient.from_config(cfg, breakers=False)
+    qbit = QbitClient(cfg, http)
+    qbit.login()
+    started, torrents, files_total = time.monotonic(), 0, 0
+
+    def with_files(t: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        try:
+            return t, qbit.files(t["hash"]) or []
+        except Exception as e:
+            log.warning("Dump: files fetch failed for %s: %s", t.get("hash"), e)
+            return t, []
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        for category in qbit.categories_matching(cfg.allowed_categories):
+            offset = 0
+            while True:
+                page = qbit.torrents({"category": category, "sort": "added_on", "limit": PAGE_SIZE, "offset": offset})
+                for t, files in pool.map(with_files, page):
+                    out.write(json.dumps({
+                        "hash": t.get("hash"), "name": t.get("name") or "", "category": category,
+                        "size": t.get("size"), "added_on": t.get("added_on"),
+                        "files": [{"index": f.get("index", i), "name": f.get("name", ""), "size": int(f.get("size", 0))}
+                                  for i, f in enumerate(files)],
+                    }, separators=(",", ":")) + "\n")
+                    torrents += 1
+                    files_total += len(files)
+                offset += len(page)
+                if len(page) < PAGE_SIZE:
+                    break
+            log.info("Dump [%s]: %d torrent(s) so far.", category, torrents)
+    os.replace(tmp, path)
+    log.info("Dump complete: %s | torrents=%d files=%d | %.1fs", path, torrents, files_total, time.monotonic() - started)
+
+
+# --------------------------- run ---------------------------
+
+_cleaners: Tuple[IsoCleaner, IsoCleaner] = None  # per worker process
+
+
+def _init_worker(base: Config, candidate: Config) -> None:
+    global _cleaners
+    logging.getLogger().setLevel(logging.WARNING)
+    # Pure evaluation only: no qB/Arr clients
+    _cleaners = (IsoCleaner(base, None, None, None), IsoCleaner(candidate, None, None, None))
+
+
+def _label(v: PolicyVerdict) -> str:
+    if v.delete:
+        return f"delete:{v.reason}"
+    return "keep:selective" if v.deselect else "keep"
+
+
+def _evaluate_batch(lines: List[str]) -> Tuple[Counter, int, List[Dict[str, Any]]]:
+    """Returns (base->candidate transition counts, file rows seen, flipped torrents)."""
+    transitions: Counter = Counter()
+    rows = 0
+    flips = []
+    base, cand = _cleaners
+    for line in lines:
+        if not line.strip():
+            continue
+        t = json.loads(line)
+        files = t.get("files") or []
+        rows += len(files)
+        if not files:
+            transitions[("no-metadata", "no-metadata")] += 1
+            continue
+        a, b = _label(base.evaluate(files)), _label(cand.evaluate(files))
+        transitions[(a, b)] += 1
+        if a != b:
+            flips.append({"hash": t.get("hash"), "name": t.get("name"), "category": t.get("category"), "base": a, "candidate": b})
+    return transitions, rows, flips
+
+
+def _batches(path: str) -> Iterator[List[str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        batch = []
+        for line in f:
+            batch.append(line)
+            if len(batch) >= BATCH_LINES:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _load_config(path: Optional[str]) -> Config:
+    if path and not os.path.isfile(path):
+        raise SystemExit(f"config overrides file not found: {path}")
+    return Config(config_file=path) if path else Config()
+
+
+def simulate(snapshot: str, base: Config, candidate: Config, workers: int, show: int, diff_out: Optional[str]) -> None:
+    started = time.monotonic()
+    transitions: Counter = Counter()
+    rows = 0
+    flips: List[Dict[str, Any]] = []
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(base, candidate)) as pool:
+        for t, r, f in pool.imap_unordered(_evaluate_batch, _batches(snapshot)):
+            transitions.update(t)
+            rows += r
+            flips.extend(f)
+    torrents = sum(transitions.values())
+    elapsed = max(time.monotonic() - started, 1e-6)
+
+    if diff_out:
+        with open(diff_out, "w", encoding="utf-8") as out:
+            for f in flips:
+                out.write(json.dumps(f) + "\n")
+
+    print(f"Simulated {torrents} torrent(s), {rows} file row(s) in {elapsed:.1f}s "
+          f"({rows / elapsed:,.0f} rows/s, {workers} worker(s)).")
+    print(f"Verdict flips: {len(flips)}")
+    print()
+    print(f"{'base':<18} {'candidate':<18} {'torrents':>10}")
+    for (a, b), n in sorted(transitions.items(), key=lambda kv: (kv[0][0] == kv[0][1], -kv[1])):
+        print(f"{a:<18} {b:<18} {n:>10}{'' if a == b else '  *'}")
+    if flips and show > 0:
+        print()
+        for f in flips[:show]:
+            print(f"{f['base']:>16} -> {f['candidate']:<16} [{f['category']}] {f['name']} ({f['hash']})")
+        if len(flips) > show:
+            print(f"... {len(flips) - show} more" + (f" (all in {diff_out})" if diff_out else " (use --diff-out)"))
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(prog="simulate.py", description="Offline extension/ISO policy simulator.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("dump", help="snapshot qB torrents + file lists to JSONL (read-only)")
+    d.add_argument("snapshot", nargs="?", default=DEFAULT_SNAPSHOT)
+    r = sub.add_parser("run", help="evaluate a snapshot under two configs and print the verdict diff")
+    r.add_argument("snapshot")
+    r.add_argument("--base", help="JSON field overrides for the base config (default: current env)")
+    r.add_argument("--candidate", help="JSON field overrides for the candidate config")
+    r.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    r.add_argument("--show", type=int, default=20, help="flipped torrents to list (default 20)")
+    r.add_argument("--diff-out", help="write every flipped torrent to this JSONL file")
+    args = ap.parse_args(argv[1:])
+
+    log.info("qbit-guard simulate starting - version: %s", VERSION)
+    if args.cmd == "dump":
+        dump(Config(), args.snapshot)
+        return
+    base, candidate = _load_config(args.base), _load_config(args.candidate)
+    simulate(args.snapshot, base, candidate, max(1, args.workers), args.show, args.diff_out)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -16,14 +16,33 @@ Behavior:
     will be processed again.
 - Optional: force a rescan if category or tags contain WATCH_RESCAN_KEYWORD
   (default 'rescan'), even if we've already processed it in this session.
+- WATCH_QBIT_INSTANCES lets one process watch several qB instances: each gets its own
+  session, sync/maindata loop, rid and seen-set, while all share one scheduler/worker pool
+  and one set of Sonarr/Radarr/TVmaze/TVDB clients and caches.
+- Optional sharding (WATCH_SHARD_BACKEND=sqlite): several replicas split hashes by
+  consistent hashing over live members and take a lease before each run, so no hash runs
+  twice; hashes owned by a replica that dies are adopted once its lease/membership expires.
+- GUARD_EXTS_FILE / GUARD_CONFIG_FILE are mtime-polled; on change a new guard is built
+  (sharing HTTP client and caches) and swapped in between runs. qB connection settings
+  used by the watcher itself still need a restart.
+- WATCH_DISCOVERY_MODE=info replaces sync/maindata with an added_on cursor over
+  /torrents/info (only new adds are transferred), plus periodic full reconciliation for
+  removals. Per-poll bytes and CPU are exported as metrics for comparing the two modes.
+- Every WATCH_STRANDED_SWEEP_SECONDS, torrents left in guard:stopped without an outcome
+  tag (e.g. the watcher died mid-run) are requeued, so no rescan tagging is needed.
+- Discovered torrents go through a priority scheduler (rescan tag, category rank,
+  added_on age, size) with per-category fairness and a bounded queue; the poll loop
+  blocks (backpressure) while the queue is full.
 """
 
-import os, sys, json, time, signal, logging, urllib.parse as uparse
-from typing import Dict, Set, Tuple
+import os, sys, json, time, heapq, bisect, signal, socket, hashlib, sqlite3, logging, threading, itertools, dataclasses, urllib.parse as uparse
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
 import urllib.error
 
 # Your class-based guard + clients
-from guard import Config, HttpClient, QbitClient, TorrentGuard
+from guard import Config, ConfigReloader, HttpClient, QbitClient, TorrentGuard, metrics
 from version import VERSION
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -47,6 +66,35 @@ log.addFilter(VersionFilter())
 POLL_SEC = float(os.getenv("WATCH_POLL_SECONDS", "3.0"))
 PROCESS_EXISTING_AT_START = os.getenv("WATCH_PROCESS_EXISTING_AT_START", "0") == "1"
 RESCAN_KEYWORD = os.getenv("WATCH_RESCAN_KEYWORD", "rescan").strip().lower()  # in category/tags -> force
+METRICS_LOG_SEC = float(os.getenv("WATCH_METRICS_LOG_SECONDS", "300"))  # 0 = never dump metrics
+
+# Scheduling
+WORKERS = max(1, int(os.getenv("WATCH_WORKERS", "1")))
+QUEUE_MAX = max(1, int(os.getenv("WATCH_QUEUE_MAX", "1000")))
+PRIORITY_ORDER = [k for k in (k.strip().lower() for k in os.getenv("WATCH_PRIORITY_ORDER", "rescan,category,age,size").split(","))
+                  if k in ("rescan", "category", "age", "size")]
+# "radarr:0,tv-sonarr:1" -> lower rank runs first; unlisted categories get WATCH_CATEGORY_PRIORITY_DEFAULT
+CATEGORY_PRIORITY = {
+    c.split(":", 1)[0].strip().lower(): int(c.split(":", 1)[1])
+    for c in os.getenv("WATCH_CATEGORY_PRIORITY", "").split(",") if ":" in c
+}
+CATEGORY_PRIORITY_DEFAULT = int(os.getenv("WATCH_CATEGORY_PRIORITY_DEFAULT", "10"))
+
+# Sharding across replicas (off unless a lease backend is configured)
+SHARD_BACKEND = os.getenv("WATCH_SHARD_BACKEND", "").strip().lower()  # "" (off) | sqlite
+SHARD_DB = os.getenv("WATCH_SHARD_DB", "/config/shards.sqlite")
+SHARD_REPLICA_ID = os.getenv("WATCH_SHARD_REPLICA_ID", "") or f"{socket.gethostname()}-{os.getpid()}"
+SHARD_MEMBER_TTL_SEC = float(os.getenv("WATCH_SHARD_MEMBER_TTL_SEC", "30"))
+SHARD_CLAIM_TTL_SEC = float(os.getenv("WATCH_SHARD_CLAIM_TTL_SEC", "120"))
+SHARD_DONE_KEEP_SEC = float(os.getenv("WATCH_SHARD_DONE_KEEP_SEC", "604800"))  # remember finished hashes for 7 days
+
+# Discovery: "maindata" (sync/maindata deltas) or "info" (added_on cursor over /torrents/info)
+DISCOVERY_MODE = os.getenv("WATCH_DISCOVERY_MODE", "maindata").strip().lower()
+INFO_PAGE = max(1, int(os.getenv("WATCH_INFO_PAGE_SIZE", "50")))
+RECONCILE_SEC = float(os.getenv("WATCH_RECONCILE_SECONDS", "300"))  # info mode: full listing for removals
+
+# Crash recovery: re-run torrents left in guard:stopped with no outcome tag (0 = off)
+STRANDED_SWEEP_SEC = float(os.getenv("WATCH_STRANDED_SWEEP_SECONDS", "120"))
 
 # Connection retry configuration
 MAX_RETRY_ATTEMPTS = int(os.getenv("QBIT_MAX_RETRY_ATTEMPTS", "5"))
@@ -71,13 +119,6 @@ def exponential_backoff_sleep(attempt: int, initial_delay: float = INITIAL_BACKO
     log.info("Connection failed, retrying in %.1f seconds (attempt %d/%d)", delay, attempt + 1, MAX_RETRY_ATTEMPTS)
     time.sleep(delay)
 
-def qb_sync_maindata(http: HttpClient, cfg: Config, rid: int) -> Dict:
-    url = f"{cfg.qbit_host}/api/v2/sync/maindata"
-    if rid:
-        url += "?" + uparse.urlencode({"rid": rid})
-    raw = http.get(url)
-    return {} if not raw else json.loads(raw.decode("utf-8"))
-
 def _should_process(h: str, t: Dict, seen: Set[str]) -> Tuple[bool, str]:
     # Manual rescan via keyword in category or tags
     cat = (t.get("category") or "").strip().lower()
@@ -88,135 +129,824 @@ def _should_process(h: str, t: Dict, seen: Set[str]) -> Tuple[bool, str]:
         return True, "new"
     return False, "already-seen"
 
-def main():
-    cfg = Config()
-    http = HttpClient(cfg.ignore_tls, cfg.user_agent)
-    qb = QbitClient(cfg, http)
-    guard = TorrentGuard(cfg)
+# --------------------------- Scheduler ---------------------------
 
-    # graceful shutdown
-    stop = {"flag": False}
-    def _sig(*_): stop["flag"] = True
-    for s in (signal.SIGINT, signal.SIGTERM):
-        signal.signal(s, _sig)
+@dataclass
+class GuardJob:
+    hash: str
+    category: str
+    name: str = ""
+    reason: str = "new"
+    size: int = 0
+    added_on: int = 0
+    instance: str = "default"
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def key(self) -> str:
+        """Queue identity; the same infohash may live on several qB instances."""
+        return f"{self.instance}/{self.hash}"
+
+    @classmethod
+    def from_torrent(cls, h: str, t: Dict, reason: str, instance: str = "default") -> "GuardJob":
+        return cls(h, (t.get("category") or "").strip(), t.get("name") or "", reason,
+                   int(t.get("size") or t.get("total_size") or 0), int(t.get("added_on") or 0), instance)
+
+
+def job_priority(job: GuardJob) -> Tuple:
+    """Sort key built from WATCH_PRIORITY_ORDER; smaller runs first."""
+    keys = {
+        "rescan": 0 if job.reason == "manual-rescan" else 1,
+        "category": CATEGORY_PRIORITY.get(job.category.lower(), CATEGORY_PRIORITY_DEFAULT),
+        "age": -job.added_on,   # newest grabs first; bulk backfills are usually older
+        "size": job.size,       # small torrents resolve metadata fastest
+    }
+    return tuple(keys[k] for k in PRIORITY_ORDER)
+
+
+class GuardScheduler:
+    """
+    Bounded priority queue in front of TorrentGuard.run with a small worker pool.
+    Jobs are kept in one heap per category. The next job comes from the best head overall;
+    categories whose heads share the same class (rescan flag + category rank) are served
+    round-robin so a bulk import in one category can't starve another.
+    """
+    def __init__(self, run: Callable[[GuardJob], None], workers: int = WORKERS, max_depth: int = QUEUE_MAX):
+        self.run = run
+        self.workers = workers
+        self.max_depth = max_depth
+        self._heaps: Dict[str, List[Tuple[Tuple, int, GuardJob]]] = {}
+        self._queued: Set[str] = set()
+        self._inflight: Set[str] = set()
+        self._deferred: Dict[str, GuardJob] = {}  # manual rescans of keys that were running when submitted
+        self._last_served: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._serve_seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._backpressure = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"guard-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def depth(self) -> int:
+        return len(self._queued)
+
+    def busy(self, key: str) -> bool:
+        with self._cond:
+            return key in self._queued or key in self._inflight
+
+    def submit(self, job: GuardJob, stop: Optional[Dict[str, bool]] = None, block: bool = True) -> bool:
+        """Queue a job. Blocks while the queue is full (backpressure) unless block=False. False if dropped/closed/full."""
+        with self._cond:
+            if job.key in self._queued:
+                return True
+            if job.key in self._inflight:
+                # Never run one key on two workers; a manual rescan runs again once the current run ends
+                if job.reason == "manual-rescan":
+                    self._deferred[job.key] = job
+                return True
+            if not block and len(self._queued) >= self.max_depth:
+                return False
+            while len(self._queued) >= self.max_depth and not self._closed and not (stop and stop["flag"]):
+                if not self._backpressure:
+                    self._backpressure = True
+                    log.warning("Scheduler queue full (depth=%d); pausing discovery until workers catch up.", len(self._queued))
+                    metrics.inc("scheduler_backpressure_events")
+                self._cond.wait(1.0)
+            if self._closed or (stop and stop["flag"]):
+                return False
+            if self._backpressure:
+                self._backpressure = False
+                log.info("Scheduler queue drained (depth=%d); resuming discovery.", len(self._queued))
+            cat = job.category.lower()
+            heapq.heappush(self._heaps.setdefault(cat, []), (job_priority(job), next(self._seq), job))
+            self._queued.add(job.key)
+            metrics.set("scheduler_queue_depth", len(self._queued))
+            self._cond.notify_all()
+            return True
+
+    def _pop(self) -> GuardJob:
+        # caller holds the condition
+        heads = [(heap[0][0], cat) for cat, heap in self._heaps.items() if heap]
+        best = min(k for k, _ in heads)
+        best_class = self._job_class(best)
+        candidates = [cat for k, cat in heads if self._job_class(k) == best_class]
+        cat = min(candidates, key=lambda c: self._last_served.get(c, -1))
+        _, _, job = heapq.heappop(self._heaps[cat])
+        if not self._heaps[cat]:
+            del self._heaps[cat]
+        self._last_served[cat] = next(self._serve_seq)
+        self._queued.discard(job.key)
+        self._inflight.add(job.key)
+        metrics.set("scheduler_queue_depth", len(self._queued))
+        return job
+
+    @staticmethod
+    def _job_class(key: Tuple) -> Tuple:
+        return tuple(v for k, v in zip(PRIORITY_ORDER, key) if k in ("rescan", "category"))
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queued and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                job = self._pop()
+                self._cond.notify_all()
+            waited = time.monotonic() - job.enqueued_at
+            metrics.inc("scheduler_wait_seconds_total", round(waited, 3))
+            log.info("[%s] Processing %s | reason=%s | category='%s' | waited=%.1fs | name='%s'",
+                     job.instance, job.hash, job.reason, job.category, waited, job.name)
+            try:
+                self.run(job)
+            except BaseException as e:  # guard.run may sys.exit() on login failure
+                log.error("Guard run failed for %s: %s", job.hash, e)
+            finally:
+                with self._cond:
+                    self._inflight.discard(job.key)
+                    again = self._deferred.pop(job.key, None)
+                    if again and not self._closed:
+                        heapq.heappush(self._heaps.setdefault(again.category.lower(), []),
+                                       (job_priority(again), next(self._seq), again))
+                        self._queued.add(again.key)
+                        metrics.set("scheduler_queue_depth", len(self._queued))
+                    self._cond.notify_all()
+                metrics.inc("scheduler_jobs_done")
+
+    def close(self, timeout: float = 30.0) -> None:
+        with self._cond:
+            self._closed = True
+            dropped = len(self._queued)
+            self._cond.notify_all()
+        if dropped:
+            log.info("Scheduler closing; %d queued job(s) not processed.", dropped)
+        deadline = time.monotonic() + timeout
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+
+
+# --------------------------- Sharding ---------------------------
+
+class LeaseBackend(ABC):
+    """
+    Coordination store for sharded replicas. Implementations must be safe across processes.
+    - Membership: heartbeat() keeps a replica alive; members() lists live replicas.
+    - Claims: claim() takes an exclusive, expiring lease on a job key before it runs;
+      complete() marks it done (so no replica runs it again); forget() drops all state for a key.
+    """
+    @abstractmethod
+    def heartbeat(self, member: str, ttl: float) -> None: ...
+    @abstractmethod
+    def leave(self, member: str) -> None: ...
+    @abstractmethod
+    def members(self) -> List[str]: ...
+    @abstractmethod
+    def claim(self, key: str, owner: str, ttl: float, force: bool = False) -> bool: ...
+    @abstractmethod
+    def renew(self, keys: List[str], owner: str, ttl: float) -> None: ...
+    @abstractmethod
+    def complete(self, key: str, owner: str, keep: float) -> None: ...
+    @abstractmethod
+    def forget(self, key: str) -> None: ...
+    @abstractmethod
+    def states(self, keys: List[str]) -> Dict[str, Tuple[str, float, bool]]: ...
+    def gc(self) -> None: pass
+
+
+class SqliteLeaseBackend(LeaseBackend):
+    """Default backend: one SQLite file on local disk shared by all replicas (WAL, IMMEDIATE transactions)."""
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=15.0, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS members (name TEXT PRIMARY KEY, expires REAL NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, "
+                        "expires REAL NOT NULL, done INTEGER NOT NULL DEFAULT 0)")
+
+    def _tx(self, fn):
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(self.db)
+                self.db.execute("COMMIT")
+                return out
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, member: str, ttl: float) -> None:
+        self._tx(lambda db: db.execute("INSERT OR REPLACE INTO members (name, expires) VALUES (?, ?)", (member, time.time() + ttl)))
+
+    def leave(self, member: str) -> None:
+        self._tx(lambda db: db.execute("DELETE FROM members WHERE name = ?", (member,)))
+
+    def members(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self.db.execute("SELECT name FROM members WHERE expires > ? ORDER BY name", (time.time(),))]
+
+    def claim(self, key: str, owner: str, ttl: float, force: bool = False) -> bool:
+        def _claim(db) -> bool:
+            now = time.time()
+            row = db.execute("SELECT owner, expires, done FROM leases WHERE key = ?", (key,)).fetchone()
+            if row:
+                cur_owner, expires, done = row
+                if done and not force:
+                    return False
+                if not done and cur_owner != owner and expires > now:
+                    return False  # live claim held by another replica
+            db.execute("INSERT OR REPLACE INTO leases (key, owner, expires, done) VALUES (?, ?, ?, 0)", (key, owner, now + ttl))
+            return True
+        return self._tx(_claim)
+
+    def renew(self, keys: List[str], owner: str, ttl: float) -> None:
+        if keys:
+            exp = time.time() + ttl
+            self._tx(lambda db: db.executemany("UPDATE leases SET expires = ? WHERE key = ? AND owner = ? AND done = 0",
+                                               [(exp, k, owner) for k in keys]))
+
+    def complete(self, key: str, owner: str, keep: float) -> None:
+        self._tx(lambda db: db.execute("UPDATE leases SET done = 1, expires = ? WHERE key = ? AND owner = ?",
+                                       (time.time() + keep, key, owner)))
+
+    def forget(self, key: str) -> None:
+        self._tx(lambda db: db.execute("DELETE FROM leases WHERE key = ?", (key,)))
+
+    def states(self, keys: List[str]) -> Dict[str, Tuple[str, float, bool]]:
+        out: Dict[str, Tuple[str, float, bool]] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                q = "SELECT key, owner, expires, done FROM leases WHERE key IN (%s)" % ",".join("?" * len(chunk))
+                for k, o, e, d in self.db.execute(q, chunk):
+                    out[k] = (o, e, bool(d))
+        return out
+
+    def gc(self) -> None:
+        now = time.time()
+        def _gc(db):
+            db.execute("DELETE FROM members WHERE expires < ?", (now - 3600,))
+            db.execute("DELETE FROM leases WHERE done = 1 AND expires < ?", (now,))
+        self._tx(_gc)
+
+
+LEASE_BACKENDS: Dict[str, Callable[[], LeaseBackend]] = {
+    "sqlite": lambda: SqliteLeaseBackend(SHARD_DB),
+}
+
+
+class HashRing:
+    """Consistent hashing with virtual nodes; a member joining/leaving only moves ~1/N of the keys."""
+    def __init__(self, members: List[str], vnodes: int = 64):
+        self.members = sorted(members)
+        self._ring = sorted((self._h(f"{m}#{i}"), m) for m in self.members for i in range(vnodes))
+        self._keys = [k for k, _ in self._ring]
+
+    @staticmethod
+    def _h(s: str) -> int:
+        return int.from_bytes(hashlib.md5(s.encode()).digest()[:8], "big")
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._ring:
+            return None
+        i = bisect.bisect(self._keys, self._h(key)) % len(self._ring)
+        return self._ring[i][1]
+
+
+class ShardCoordinator:
+    """
+    Splits job keys across replicas by consistent hashing over the live member list, and
+    guards every run with a lease so two replicas never run the same hash. Jobs seen but owned
+    by another replica are parked; if that replica dies (membership/lease expiry) they're adopted.
+    """
+    def __init__(self, backend: LeaseBackend, replica_id: str = SHARD_REPLICA_ID):
+        self.backend = backend
+        self.me = replica_id
+        self._lock = threading.Lock()
+        self._held: Set[str] = set()
+        self._parked: Dict[str, GuardJob] = {}
+        self.ring = HashRing([self.me])
+        self._last_gc = time.monotonic()
+        self.backend.heartbeat(self.me, SHARD_MEMBER_TTL_SEC)
+        self._refresh_ring()
+
+    def _refresh_ring(self) -> None:
+        members = self.backend.members()
+        if self.me not in members:
+            members.append(self.me)
+        if sorted(members) != self.ring.members:
+            log.info("Shard ring: %d replica(s) %s (me=%s)", len(members), ",".join(sorted(members)), self.me)
+            self.ring = HashRing(members)
+            metrics.set("shard_replicas", len(members))
+
+    def owns(self, key: str) -> bool:
+        return self.ring.owner(key) == self.me
+
+    def park(self, job: GuardJob) -> None:
+        with self._lock:
+            self._parked[job.key] = job
+            metrics.set("shard_parked", len(self._parked))
+
+    def claim(self, job: GuardJob) -> bool:
+        ok = self.backend.claim(job.key, self.me, SHARD_CLAIM_TTL_SEC, force=job.reason in ("manual-rescan", "stranded"))
+        if ok:
+            with self._lock:
+                self._held.add(job.key)
+        return ok
+
+    def complete(self, job: GuardJob) -> None:
+        with self._lock:
+            self._held.discard(job.key)
+        self.backend.complete(job.key, self.me, SHARD_DONE_KEEP_SEC)
+
+    def release(self, job: GuardJob) -> None:
+        """Run failed: drop the lease without marking it done, so a rescan/sweep or another replica may retry."""
+        with self._lock:
+            self._held.discard(job.key)
+        self.backend.forget(job.key)
+
+    def forget(self, key: str) -> None:
+        """Torrent removed from qB: a future re-add must be processed again."""
+        with self._lock:
+            self._parked.pop(key, None)
+        self.backend.forget(key)
+
+    def tick(self) -> List[GuardJob]:
+        """Heartbeat, renew held leases, refresh the ring; returns parked jobs this replica should now run."""
+        with self._lock:
+            held = list(self._held)
+        self.backend.heartbeat(self.me, SHARD_MEMBER_TTL_SEC)
+        self.backend.renew(held, self.me, SHARD_CLAIM_TTL_SEC)
+        self._refresh_ring()
+        if time.monotonic() - self._last_gc >= 3600:
+            self._last_gc = time.monotonic()
+            self.backend.gc()
+        with self._lock:
+            parked = list(self._parked.values())
+        if not parked:
+            return []
+        states = self.backend.states([j.key for j in parked])
+        now, adopt = time.time(), []
+        with self._lock:
+            for job in parked:
+                owner, expires, done = states.get(job.key, ("", 0.0, False))
+                if done:
+                    self._parked.pop(job.key, None)  # another replica finished it
+                elif self.owns(job.key) and not (owner and owner != self.me and expires > now):
+                    self._parked.pop(job.key, None)
+                    adopt.append(job)
+            metrics.set("shard_parked", len(self._parked))
+        if adopt:
+            log.info("Shard: adopting %d job(s) from departed replicas.", len(adopt))
+        return adopt
+
+    def start(self, scheduler: "GuardScheduler", stop: Dict[str, bool]) -> threading.Thread:
+        """
+        Tick on a dedicated thread: heartbeats and lease renewals must not stall behind a blocked
+        discovery loop. Adopted jobs are submitted without blocking and parked again if the queue is full.
+        """
+        def _keep() -> None:
+            while not stop["flag"]:
+                try:
+                    for job in self.tick():
+                        if not scheduler.submit(job, stop, block=False):
+                            self.park(job)
+                except Exception as e:
+                    log.warning("Shard tick failed: %s", e)
+                for _ in range(max(1, int(SHARD_MEMBER_TTL_SEC / 3))):
+                    if stop["flag"]:
+                        break
+                    time.sleep(1.0)
+        t = threading.Thread(target=_keep, name="shard-keeper", daemon=True)
+        t.start()
+        return t
+
+    def leave(self) -> None:
+        try:
+            self.backend.leave(self.me)
+        except Exception as e:
+            log.warning("Shard: leave failed: %s", e)
+
+
+# --------------------------- Discovery ---------------------------
+
+class Discovery(ABC):
+    """
+    Source of (torrents, removed) deltas for one qB. The first poll after reset() is a full snapshot.
+    `last_bytes` is the response volume of the last poll (for the per-poll cost metrics).
+    """
+    def __init__(self, http: HttpClient, cfg: Config):
+        self.http = http
+        self.cfg = cfg
+        self.last_bytes = 0
+
+    def _get_json(self, path: str, params: Optional[Dict] = None):
+        url = f"{self.cfg.qbit_host}{path}"
+        if params:
+            url += "?" + uparse.urlencode(params)
+        raw = self.http.get(url)
+        self.last_bytes += len(raw or b"")
+        return None if not raw else json.loads(raw.decode("utf-8"))
+
+    @abstractmethod
+    def reset(self) -> None: ...
 
-    # login with retry logic
-    def ensure_authenticated() -> bool:
+    @abstractmethod
+    def poll(self) -> Optional[Tuple[Dict[str, Dict], List[str]]]: ...
+
+
+class MaindataDiscovery(Discovery):
+    """sync/maindata with rid: cheap when idle, but every active torrent's progress/speed churn rides along."""
+    def __init__(self, http: HttpClient, cfg: Config):
+        super().__init__(http, cfg)
+        self.rid = 0
+
+    def reset(self) -> None:
+        self.rid = 0
+
+    def poll(self) -> Optional[Tuple[Dict[str, Dict], List[str]]]:
+        self.last_bytes = 0
+        data = self._get_json("/api/v2/sync/maindata", {"rid": self.rid} if self.rid else None)
+        if not data:
+            return None
+        self.rid = data.get("rid", self.rid)
+        return data.get("torrents") or {}, data.get("torrents_removed") or []
+
+
+class InfoCursorDiscovery(Discovery):
+    """
+    Polls /torrents/info sorted by added_on (newest first, WATCH_INFO_PAGE_SIZE per page) and keeps an
+    added_on high-water mark plus the hashes seen at that exact timestamp; only pages past the mark are read.
+    Re-adds come back with a fresh added_on and are reported as removed+added. Removals (and anything
+    the cursor missed) are picked up by a full listing every WATCH_RECONCILE_SECONDS. Manual rescans are
+    found by querying the rescan keyword as a tag and as a category each poll.
+    """
+    def __init__(self, http: HttpClient, cfg: Config):
+        super().__init__(http, cfg)
+        self.reset()
+
+    def reset(self) -> None:
+        self.mark: Optional[int] = None
+        self.at_mark: Set[str] = set()
+        self.known: Set[str] = set()
+        self.rescanning: Set[str] = set()
+        self.last_reconcile = 0.0
+
+    def _is_new(self, t: Dict) -> bool:
+        added = int(t.get("added_on") or 0)
+        return added > self.mark or (added == self.mark and t.get("hash") not in self.at_mark)
+
+    def _advance(self, rows: List[Dict]) -> None:
+        for t in rows:
+            added = int(t.get("added_on") or 0)
+            if self.mark is None or added > self.mark:
+                self.mark, self.at_mark = added, {t["hash"]}
+            elif added == self.mark:
+                self.at_mark.add(t["hash"])
+
+    def _full(self) -> Dict[str, Dict]:
+        return {t["hash"]: t for t in (self._get_json("/api/v2/torrents/info") or [])}
+
+    def poll(self) -> Optional[Tuple[Dict[str, Dict], List[str]]]:
+        self.last_bytes = 0
+        if self.mark is None:
+            full = self._full()
+            self._advance(list(full.values()))
+            self.mark = self.mark or 0
+            self.known = set(full)
+            self.rescanning = {h for h, t in full.items() if RESCAN_KEYWORD and (
+                (t.get("category") or "").strip().lower() == RESCAN_KEYWORD
+                or RESCAN_KEYWORD in (x.strip().lower() for x in (t.get("tags") or "").split(",")))}
+            self.last_reconcile = time.monotonic()
+            return full, []
+
+        fresh: List[Dict] = []
+        offset = 0
+        while True:
+            page = self._get_json("/api/v2/torrents/info", {"sort": "added_on", "reverse": "true",
+                                                            "limit": INFO_PAGE, "offset": offset}) or []
+            new = [t for t in page if self._is_new(t)]
+            fresh.extend(new)
+            if len(new) < len(page) or len(page) < INFO_PAGE:
+                break
+            offset += len(page)
+        torrents = {t["hash"]: t for t in fresh}
+        removed = [h for h in torrents if h in self.known]  # re-added since we last saw it
+        self._advance(fresh)
+        self.known |= set(torrents)
+
+        if RESCAN_KEYWORD:
+            tagged: Dict[str, Dict] = {}
+            for params in ({"tag": RESCAN_KEYWORD}, {"category": RESCAN_KEYWORD}):
+                for t in self._get_json("/api/v2/torrents/info", params) or []:
+                    tagged[t["hash"]] = t
+            for h in set(tagged) - self.rescanning:
+                torrents.setdefault(h, tagged[h])  # only on entering the rescan set, like a maindata delta
+            self.rescanning = set(tagged)
+
+        if RECONCILE_SEC > 0 and time.monotonic() - self.last_reconcile >= RECONCILE_SEC:
+            self.last_reconcile = time.monotonic()
+            full = self._full()
+            gone = self.known - set(full)
+            missed = {h: t for h, t in full.items() if h not in self.known}
+            if gone or missed:
+                log.info("Reconcile: %d removed, %d missed by the cursor.", len(gone), len(missed))
+            removed.extend(gone)
+            torrents.update(missed)
+            self.known = set(full)
+            self._advance(list(missed.values()))
+        return torrents, removed
+
+
+DISCOVERY_MODES = {"maindata": MaindataDiscovery, "info": InfoCursorDiscovery}
+
+
+# --------------------------- qB instances ---------------------------
+
+def parse_instances(spec: str, cfg: Config) -> List[Tuple[str, str, str, str]]:
+    """
+    WATCH_QBIT_INSTANCES -> [(name, host, user, pass)].
+    Accepts a JSON list ([{"name","host","user","pass"}, ...]) or a comma-separated list of
+    name=http://[user:pass@]host:port entries; missing credentials fall back to QBIT_USER/QBIT_PASS.
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return [("default", cfg.qbit_host, cfg.qbit_user, cfg.qbit_pass)]
+    out = []
+    if spec.startswith("["):
+        for i, d in enumerate(json.loads(spec)):
+            out.append((str(d.get("name") or f"qb{i}"), str(d["host"]).rstrip("/"),
+                        str(d.get("user", cfg.qbit_user)), str(d.get("pass", cfg.qbit_pass))))
+        return out
+    for i, item in enumerate(x.strip() for x in spec.split(",") if x.strip()):
+        name, _, url = item.partition("=") if "=" in item.split("://", 1)[0] else ("", "", item)
+        parts = uparse.urlsplit(url)
+        host = f"{parts.scheme}://{parts.hostname}" + (f":{parts.port}" if parts.port else "") + parts.path.rstrip("/")
+        out.append((name or f"qb{i}", host,
+                    uparse.unquote(parts.username) if parts.username else cfg.qbit_user,
+                    uparse.unquote(parts.password) if parts.password else cfg.qbit_pass))
+    return out
+
+
+class QbitInstance:
+    """One qB endpoint: its own session, sync/maindata loop, rid and seen-set. Guard runs go to the shared scheduler."""
+    def __init__(self, name: str, cfg: Config):
+        self.name = name
+        self.cfg = cfg
+        self.http = HttpClient.from_config(cfg, breakers=False)  # reconnect/backoff below handles outages
+        self.qb = QbitClient(cfg, self.http)
+        # Guard-side qB client gets its own session too; Arr/provider clients and caches are shared
+        self.guard_http = HttpClient.from_config(cfg, breakers=False)
+        self.seen: Set[str] = set()
+        self.recovered: Set[str] = set()  # stranded hashes already requeued by this process
+        self.discovery: Discovery = DISCOVERY_MODES[DISCOVERY_MODE](self.http, cfg)
+
+    def build_guard(self, base: TorrentGuard) -> TorrentGuard:
+        return TorrentGuard(self.cfg, shared=base, qbit_http=self.guard_http)
+
+    def ensure_authenticated(self) -> bool:
         """Ensure we're authenticated with qBittorrent, with retry logic."""
         for attempt in range(MAX_RETRY_ATTEMPTS):
             try:
-                qb.login()
+                self.qb.login()
                 return True
             except Exception as e:
                 if not is_connection_error(e) or attempt == MAX_RETRY_ATTEMPTS - 1:
-                    log.error("qB login failed after %d attempts: %s", attempt + 1, e)
+                    log.error("[%s] qB login failed after %d attempts: %s", self.name, attempt + 1, e)
                     return False
                 exponential_backoff_sleep(attempt)
         return False
 
-    if not ensure_authenticated():
-        sys.exit(2)
-
-    seen: Set[str] = set()
-    rid = 0
-    first_snapshot = True
-    consecutive_failures = 0
-    log.info(
-        "Watcher (stateless) started. poll=%.1fs, process_existing_at_start=%s, rescan-keyword='%s'",
-        POLL_SEC, PROCESS_EXISTING_AT_START, RESCAN_KEYWORD or "(disabled)"
-    )
-
-    while not stop["flag"]:
-        try:
-            data = qb_sync_maindata(http, cfg, rid)
-            if not data:
-                time.sleep(POLL_SEC)
+    def sweep_stranded(self, scheduler: "GuardScheduler", stop: Dict[str, bool],
+                       shard: Optional[ShardCoordinator] = None) -> int:
+        """
+        Requeue torrents a crashed run left stopped: tagged guard:stopped but with neither guard:allowed,
+        guard:deadline nor a trash:* tag, and not queued/running here. One /torrents/info call per sweep;
+        each hash is recovered at most once per process (dry-run blocks never get an outcome tag).
+        """
+        requeued = 0
+        for t in self.qb.torrents({"tag": "guard:stopped"}):
+            h = t.get("hash")
+            tags = {x.strip() for x in (t.get("tags") or "").split(",") if x.strip()}
+            if not h or h in self.recovered or "guard:allowed" in tags or "guard:deadline" in tags \
+                    or any(x.startswith("trash:") for x in tags):
                 continue
+            job = GuardJob.from_torrent(h, t, "stranded", self.name)
+            if scheduler.busy(job.key) or (shard and not shard.owns(job.key)):
+                continue
+            if not scheduler.submit(job, stop):
+                break
+            self.recovered.add(h)
+            requeued += 1
+        if requeued:
+            metrics.inc(f"stranded_requeued[{self.name}]", requeued)
+            log.info("[%s] Recovery: requeued %d torrent(s) stranded in guard:stopped.", self.name, requeued)
+        return requeued
 
-            # Reset failure counter on successful request
-            consecutive_failures = 0
-
-            rid = data.get("rid", rid)
-            torrents = data.get("torrents") or {}
-            removed = data.get("torrents_removed") or []
+    def loop(self, scheduler: "GuardScheduler", stop: Dict[str, bool], shard: Optional[ShardCoordinator] = None) -> int:
+        """Poll until stopped. Returns a process exit code (0 = clean stop)."""
+        if not self.ensure_authenticated():
+            return 2
+        seen = self.seen
+        discovery = self.discovery
+        first_snapshot = True
+        last_sweep = 0.0
+        consecutive_failures = 0
+        log.info("[%s] Watching %s", self.name, self.cfg.qbit_host)
 
-            # First snapshot behavior
-            if first_snapshot:
-                first_snapshot = False
-                present = set(torrents.keys())
-                if PROCESS_EXISTING_AT_START:
-                    log.info("Initial snapshot: processing %d existing torrents.", len(present))
-                    # fall through: they will be processed below (since not in 'seen' yet)
-                else:
-                    seen |= present
-                    log.info("Initial snapshot: indexed %d existing torrents (not processing).", len(present))
+        while not stop["flag"]:
+            try:
+                cpu_start = time.thread_time()
+                delta = discovery.poll()
+                metrics.inc(f"discovery_polls[{self.name}]")
+                metrics.inc(f"discovery_bytes[{self.name}]", discovery.last_bytes)
+                metrics.inc(f"discovery_cpu_ms[{self.name}]", round((time.thread_time() - cpu_start) * 1000.0, 3))
+                if delta is None:
                     time.sleep(POLL_SEC)
                     continue
 
-            # Forget hashes for removed torrents so re-adds will trigger again
-            for h in removed:
-                if h in seen:
-                    seen.discard(h)
-
-            # Handle new/changed torrents in this delta
-            for h, t in torrents.items():
-                name = t.get("name") or ""
-                category = (t.get("category") or "").strip()
-                ok, reason = _should_process(h, t, seen)
-                if not ok:
-                    log.debug("Skip %s | %s", h, reason)
-                    continue
+                # Reset failure counter on successful request
+                consecutive_failures = 0
 
-                log.info("Processing %s | reason=%s | category='%s' | name='%s'", h, reason, category, name)
-                try:
-                    guard.run(h, category)
-                except Exception as e:
-                    log.error("Guard run failed for %s: %s", h, e)
-                finally:
+                torrents, removed = delta
+
+                # First snapshot behavior
+                if first_snapshot:
+                    first_snapshot = False
+                    present = set(torrents.keys())
+                    if PROCESS_EXISTING_AT_START:
+                        log.info("[%s] Initial snapshot: processing %d existing torrents.", self.name, len(present))
+                        # fall through: they will be processed below (since not in 'seen' yet)
+                    else:
+                        seen |= present
+                        log.info("[%s] Initial snapshot: indexed %d existing torrents (not processing).", self.name, len(present))
+                        time.sleep(POLL_SEC)
+                        continue
+
+                # Forget hashes for removed torrents so re-adds will trigger again
+                for h in removed:
+                    if h in seen:
+                        seen.discard(h)
+                    if shard:
+                        shard.forget(f"{self.name}/{h}")
+
+                # Queue new/changed torrents in this delta; the scheduler decides the order
+                for h, t in torrents.items():
+                    ok, reason = _should_process(h, t, seen)
+                    if not ok:
+                        log.debug("[%s] Skip %s | %s", self.name, h, reason)
+                        continue
+                    job = GuardJob.from_torrent(h, t, reason, self.name)
+                    if shard and not shard.owns(job.key):
+                        shard.park(job)  # another replica's hash; adopted if that replica dies
+                        seen.add(h)
+                        continue
+                    if not scheduler.submit(job, stop):
+                        break
+                    log.debug("[%s] Queued %s | reason=%s | depth=%d", self.name, h, reason, scheduler.depth())
                     seen.add(h)
 
-        except Exception as e:
-            if is_connection_error(e):
-                consecutive_failures += 1
-                log.warning("Connection error (failure %d): %s", consecutive_failures, e)
-                
-                # If we've had multiple consecutive failures, attempt reconnection
-                if consecutive_failures >= 2:
-                    log.info("Multiple connection failures detected, attempting reconnection...")
-                    
-                    # Reset connection state
-                    rid = 0  # Reset request ID to start fresh
-                    first_snapshot = True  # Re-initialize snapshot state
-                    
-                    # Attempt to re-authenticate with exponential backoff
-                    reconnected = False
-                    for attempt in range(MAX_RETRY_ATTEMPTS):
-                        try:
-                            qb.login()
-                            log.info("Successfully reconnected to qBittorrent")
-                            consecutive_failures = 0
-                            reconnected = True
-                            break
-                        except Exception as auth_e:
-                            if not is_connection_error(auth_e) or attempt == MAX_RETRY_ATTEMPTS - 1:
-                                log.error("Reconnection failed after %d attempts: %s", attempt + 1, auth_e)
+                if STRANDED_SWEEP_SEC > 0 and time.monotonic() - last_sweep >= STRANDED_SWEEP_SEC:
+                    last_sweep = time.monotonic()
+                    self.sweep_stranded(scheduler, stop, shard)
+
+            except Exception as e:
+                if is_connection_error(e):
+                    consecutive_failures += 1
+                    log.warning("[%s] Connection error (failure %d): %s", self.name, consecutive_failures, e)
+
+                    # If we've had multiple consecutive failures, attempt reconnection
+                    if consecutive_failures >= 2:
+                        log.info("[%s] Multiple connection failures detected, attempting reconnection...", self.name)
+
+                        # Reset connection state
+                        discovery.reset()  # Start fresh (full snapshot)
+                        first_snapshot = True  # Re-initialize snapshot state
+
+                        # Attempt to re-authenticate with exponential backoff
+                        reconnected = False
+                        for attempt in range(MAX_RETRY_ATTEMPTS):
+                            try:
+                                self.qb.login()
+                                log.info("[%s] Successfully reconnected to qBittorrent", self.name)
+                                consecutive_failures = 0
+                                reconnected = True
                                 break
-                            exponential_backoff_sleep(attempt)
-                    
-                    if not reconnected:
-                        log.error("Failed to reconnect to qBittorrent, exiting...")
-                        sys.exit(3)
+                            except Exception as auth_e:
+                                if not is_connection_error(auth_e) or attempt == MAX_RETRY_ATTEMPTS - 1:
+                                    log.error("[%s] Reconnection failed after %d attempts: %s", self.name, attempt + 1, auth_e)
+                                    break
+                                exponential_backoff_sleep(attempt)
+
+                        if not reconnected:
+                            log.error("[%s] Failed to reconnect to qBittorrent, giving up on this instance.", self.name)
+                            return 3
+                    else:
+                        # Single failure, just wait before retry
+                        exponential_backoff_sleep(0)
                 else:
-                    # Single failure, just wait before retry
-                    exponential_backoff_sleep(0)
-            else:
-                # Non-connection error, log and continue
-                log.error("Watcher loop error: %s", e)
-                consecutive_failures = 0
+                    # Non-connection error, log and continue
+                    log.error("[%s] Watcher loop error: %s", self.name, e)
+                    consecutive_failures = 0
+
+            time.sleep(POLL_SEC)
+        return 0
+
+
+def main():
+    if DISCOVERY_MODE not in DISCOVERY_MODES:
+        log.error("Unknown WATCH_DISCOVERY_MODE '%s' (known: %s)", DISCOVERY_MODE, ",".join(DISCOVERY_MODES))
+        sys.exit(2)
+    cfg = Config()
+    instances = [QbitInstance(name, dataclasses.replace(cfg, qbit_host=host, qbit_user=user, qbit_pass=pw))
+                 if (host, user, pw) != (cfg.qbit_host, cfg.qbit_user, cfg.qbit_pass) else QbitInstance(name, cfg)
+                 for name, host, user, pw in parse_instances(os.getenv("WATCH_QBIT_INSTANCES", ""), cfg)]
+
+    # One base guard owns the shared Arr/provider clients and caches; each instance gets a guard
+    # on top of it with its own qB session. All are swapped together on config reload. Jobs pick
+    # their guard up when they start, so in-flight runs finish on the guard (and policy) they started with.
+    base = TorrentGuard(cfg)
+    base.start_background()
+    current = {"guards": {i.name: i.build_guard(base) for i in instances}}
+    reloader = ConfigReloader(cfg)
+
+    # graceful shutdown
+    stop = {"flag": False}
+    def _sig(*_): stop["flag"] = True
+    for s in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(s, _sig)
+
+    shard: Optional[ShardCoordinator] = None
+    if SHARD_BACKEND:
+        if SHARD_BACKEND not in LEASE_BACKENDS:
+            log.error("Unknown WATCH_SHARD_BACKEND '%s' (known: %s)", SHARD_BACKEND, ",".join(LEASE_BACKENDS))
+            sys.exit(2)
+        shard = ShardCoordinator(LEASE_BACKENDS[SHARD_BACKEND]())
+
+    def run_job(job: GuardJob) -> None:
+        if shard and not shard.claim(job):
+            log.info("[%s] Skip %s | claimed or finished by another replica", job.instance, job.hash)
+            return
+        try:
+            current["guards"][job.instance].run(job.hash, job.category)
+        except BaseException:
+            if shard:
+                shard.release(job)
+            raise
+        if shard:
+            shard.complete(job)
+
+    scheduler = GuardScheduler(run_job)
+    scheduler.start()
+    if shard:
+        shard.start(scheduler, stop)
+
+    log.info(
+        "Watcher (stateless) started. instances=%s, discovery=%s, poll=%.1fs, process_existing_at_start=%s, rescan-keyword='%s', workers=%d, queue-max=%d, priority=%s",
+        ",".join(i.name for i in instances), type(instances[0].discovery).__name__, POLL_SEC, PROCESS_EXISTING_AT_START, RESCAN_KEYWORD or "(disabled)",
+        WORKERS, QUEUE_MAX, ",".join(PRIORITY_ORDER)
+    )
+
+    exit_codes: Dict[str, int] = {}
+    def _run_instance(inst: QbitInstance) -> None:
+        exit_codes[inst.name] = inst.loop(scheduler, stop, shard)
+
+    threads = [threading.Thread(target=_run_instance, args=(i,), name=f"watch-{i.name}", daemon=True) for i in instances]
+    for t in threads:
+        t.start()
+
+    last_metrics_log = time.monotonic()
+    while not stop["flag"] and any(t.is_alive() for t in threads):
+        new_cfg = reloader.poll()
+        if new_cfg is not None:
+            previous, base = base, TorrentGuard(new_cfg, shared=base)
+            base.start_background(previous)
+            for inst in instances:
+                inst.cfg = dataclasses.replace(new_cfg, qbit_host=inst.cfg.qbit_host, qbit_user=inst.cfg.qbit_user, qbit_pass=inst.cfg.qbit_pass)
+            current["guards"] = {i.name: i.build_guard(base) for i in instances}
+            log.info("Guard reloaded; new runs use the updated config.")
+
+        if METRICS_LOG_SEC > 0 and (time.monotonic() - last_metrics_log) >= METRICS_LOG_SEC:
+            last_metrics_log = time.monotonic()
+            snap = metrics.format()
+            if snap:
+                log.info("Metrics | %s", snap)
 
-        time.sleep(POLL_SEC)
+        time.sleep(min(POLL_SEC, 1.0))
 
     log.info("Watcher stopping...")
+    stop["flag"] = True
+    scheduler.close()
+    if shard:
+        shard.leave()
+    failed = [c for c in exit_codes.values() if c]
+    if failed and len(failed) == len(instances):
+        sys.exit(failed[0])
 
 if __name__ == "__main__":
     main()